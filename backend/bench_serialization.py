@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# GET /api/spells serileştirme karşılaştırması. Eski yol, seri öncesi belge şeklini kullanır
+# (completedDates metin dizisi, createdAt ISO metni; fromisoformat + response_model doğrulaması +
+# jsonable_encoder + json.dumps). Yeni yollar bitmap belgeleri (createdAt BSON date) orjson ile yazar:
+# tarihleri açan (fields=...,completedDates, aynı çıktı) ve sadece completionCount dönen varsayılan.
+# Kullanım: python bench_serialization.py [--sizes 10 100 1000] [--repeat 200]
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import server
+from server import CompletionBitmap, Spell, TrustedJSONResponse, spell_response, spell_view
+
+SPELLS_ADAPTER = TypeAdapter(List[Spell])
+
+def make_spells(count: int, user_id: str) -> List[Tuple[dict, dict]]:
+    # (seri öncesi belge, bitmap belgesi) çiftleri; ikisi aynı büyüyü ve tamamlanmaları taşır
+    spells = []
+    today = datetime.now(timezone.utc).date()
+    for i in range(count):
+        days = [today - timedelta(days=d) for d in range(0, 120, 1 + i % 3)]
+        created_at = datetime.now(timezone.utc)
+        fields = {
+            "id": str(uuid.uuid4()),
+            "title": f"Büyü {i}",
+            "description": "Her gün 30 dakika çalış",
+            "repeatType": "DAILY" if i % 4 else "WEEKLY",
+            "isCompleted": False,
+            "xpReward": 10 + i % 40,
+            "userId": user_id,
+        }
+        legacy = {
+            **fields, "completedDates": [day.isoformat() for day in sorted(days)], "createdAt": created_at.isoformat()
+        }
+        current = {**fields, "createdAt": created_at, "completionBits": CompletionBitmap.from_days(days).to_bson()}
+        spells.append((legacy, current))
+    return spells
+
+def legacy_path(spells: List[dict]) -> bytes:
+    # Seri öncesi get_spells + FastAPI serialize_response + JSONResponse.render
+    for spell in spells:
+        if isinstance(spell.get('createdAt'), str):
+            spell['createdAt'] = datetime.fromisoformat(spell['createdAt'])
+    validated = SPELLS_ADAPTER.validate_python(spells)
+    content = jsonable_encoder(SPELLS_ADAPTER.dump_python(validated, mode="json"))
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+EXPANDED_VIEW = spell_view(",".join(name for name in Spell.model_fields if name != "completionCount"))
+
+def expanded_path(spells: List[dict]) -> bytes:
+    return TrustedJSONResponse([EXPANDED_VIEW.render(spell) for spell in spells]).body
+
+def default_path(spells: List[dict]) -> bytes:
+    return TrustedJSONResponse([spell_response(spell) for spell in spells]).body
+
+def copy_spells(template: List[dict]) -> List[dict]:
+    # Motor her istekte yeni dict döndürür; iç içe dizi/sözlükler de kopyalanır
+    return [
+        {key: value.copy() if isinstance(value, (list, dict)) else value for key, value in spell.items()}
+        for spell in template
+    ]
+
+def measure(func, template: List[dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        spells = copy_spells(template)
+        start = time.perf_counter()
+        func(spells)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Spell listesi serileştirme karşılaştırması")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'büyü':>6} {'eski (ms)':>12} {'tarihli (ms)':>13} {'hızlanma':>9} {'varsayılan (ms)':>16} {'hızlanma':>9}")
+    for size in args.sizes:
+        pairs = make_spells(size, str(uuid.uuid4()))
+        legacy_template = [legacy for legacy, _ in pairs]
+        current_template = [current for _, current in pairs]
+        # Yollar aynı tamamlanmaları üretmeli
+        legacy = json.loads(legacy_path(copy_spells(legacy_template)))
+        expanded = json.loads(expanded_path(copy_spells(current_template)))
+        counted = json.loads(default_path(copy_spells(current_template)))
+        if [s['completedDates'] for s in legacy] != [s['completedDates'] for s in expanded] \
+                or [len(s['completedDates']) for s in legacy] != [s['completionCount'] for s in counted]:
+            print("Uyarı: yolların çıktısı farklı", file=sys.stderr)
+        repeat = max(args.repeat * 10 // max(size, 10), 5)
+        old = measure(legacy_path, legacy_template, repeat)
+        full = measure(expanded_path, current_template, repeat)
+        new = measure(default_path, current_template, repeat)
+        print(f"{size:>6} {old * 1000:>12.3f} {full * 1000:>13.3f} {old / full:>8.1f}x {new * 1000:>16.3f} {old / new:>8.1f}x")
+    server.client.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
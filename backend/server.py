@@ -1,47 +1,605 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson.int64 import Int64
+from sortedcontainers import SortedList
+from pymongo import ASCENDING, DESCENDING, CursorType, IndexModel, ReplaceOne, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import (
+    BulkWriteError, CollectionInvalid, DuplicateKeyError, ExecutionTimeout, OperationFailure, WaitQueueTimeoutError
+)
+from pymongo.read_preferences import Nearest, PrimaryPreferred, ReadPreference, Secondary, SecondaryPreferred
 import os
+import sys
+import argparse
+import asyncio
+import base64
+import codecs
+import csv
+import hashlib
+import hmac
+import importlib.util
+import io
+import itertools
+import json
 import logging
+import multiprocessing
+import socket
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 from passlib.context import CryptContext
 import jwt
+import orjson
 from enum import Enum
 from contextlib import asynccontextmanager # YENİ EKLENDİ
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrikler (Prometheus metin formatı, /metrics). Sayaçlar pymongo thread'lerinden de
+# güncellendiği için kilitli; render sırasında yalnızca anlık kopya alınır.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+EVENT_LOOP_LAG_INTERVAL = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL', '0.5'))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def metric_label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def metric_labels(names: Tuple[str, ...], values: Tuple[Any, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{metric_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[Any, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[Any, ...] = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple[Any, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{metric_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # Etiket başına: kova sayıları (+Inf dahil) ve en sonda toplam süre
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[Any, ...], value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+        names = self.labelnames + ("le",)
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                yield f"{self.name}_bucket{metric_labels(names, labels + (bound,))} {cumulative}"
+            label_text = metric_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {series[-1]}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+class Gauge:
+    # Değer render anında okunur; collect() (etiketler, değer) çiftleri döndürür
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], collect):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in self.collect():
+            yield f"{self.name}{metric_labels(self.labelnames, labels)} {value}"
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP istek süresi (yanıtın son baytına kadar)", ("method", "route")
+)
+http_requests_total = Counter("http_requests_total", "HTTP istek sayısı", ("method", "route", "status"))
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB komut süresi", ("collection", "command")
+)
+mongo_command_failures = Counter(
+    "mongodb_command_failures_total", "Hata dönen MongoDB komutları", ("collection", "command")
+)
+hash_duration = Histogram(
+    "password_hash_duration_seconds", "bcrypt işlemleri (kuyrukta bekleme dahil)", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "Zamanlanmış uyanmanın gecikmesi", (),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+cache_invalidations = Counter(
+    "cache_invalidations_total", "Diğer süreçlerden gelen önbellek geçersizleştirmeleri", ("collection",)
+)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # started ile succeeded/failed arasında koleksiyon adını taşımak için istek kimliği anahtarı
+    def __init__(self):
+        self._pending: Dict[Tuple[int, Any], Tuple[str, str]] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else "-"
+        self._pending[(event.request_id, event.connection_id)] = (collection, event.command_name)
+
+    def _finish(self, event) -> Tuple[str, str]:
+        labels = self._pending.pop((event.request_id, event.connection_id), ("-", event.command_name))
+        mongo_command_duration.observe(labels, event.duration_micros / 1_000_000)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        mongo_command_failures.inc(self._finish(event))
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    # Olaylar pymongo'nun izleme ve havuz thread'lerinden gelir: sayaçlar kilitli, okuma snapshot() ile
+    def __init__(self):
+        self.open: Dict[str, int] = {}
+        self.checked_out: Dict[str, int] = {}
+        self.waiting: Dict[str, int] = {}
+        self.options: Dict[str, Dict[str, Any]] = {}
+        self.cleared: Dict[str, int] = {}
+        self.checkout_failures = Counter(
+            "mongodb_pool_checkout_failures_total", "Havuzdan bağlantı alınamayan durumlar", ("address", "reason")
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _address(event) -> str:
+        return "%s:%s" % event.address
+
+    def _add(self, counts: Dict[str, int], event, amount: int):
+        address = self._address(event)
+        with self._lock:
+            counts[address] = counts.get(address, 0) + amount
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                "open": dict(self.open),
+                "checked_out": dict(self.checked_out),
+                "waiting": dict(self.waiting),
+                "cleared": dict(self.cleared),
+                "options": dict(self.options),
+            }
+
+    def pool_created(self, event):
+        with self._lock:
+            self.options[self._address(event)] = dict(event.options)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(self.cleared, event, 1)
+
+    def pool_closed(self, event):
+        address = self._address(event)
+        with self._lock:
+            for counts in (self.open, self.checked_out, self.waiting, self.options):
+                counts.pop(address, None)
+
+    def connection_created(self, event):
+        self._add(self.open, event, 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(self.open, event, -1)
+
+    def connection_check_out_started(self, event):
+        self._add(self.waiting, event, 1)
+
+    def connection_check_out_failed(self, event):
+        self._add(self.waiting, event, -1)
+        self.checkout_failures.inc((self._address(event), event.reason))
+
+    def connection_checked_out(self, event):
+        self._add(self.waiting, event, -1)
+        self._add(self.checked_out, event, 1)
+
+    def connection_checked_in(self, event):
+        self._add(self.checked_out, event, -1)
+
+mongo_pool_metrics = MongoPoolMetrics()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+
+# Bağlantı havuzu ve zaman aşımları (MONGO_URL'deki seçenekler bunlarla ezilir)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+# Ağ sıkıştırma tercih sırası; kütüphanesi kurulu olmayanlar atlanır (zlib her zaman var)
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', 'zstd,snappy,zlib')
+
+# Uç nokta gruplarının okuma ayarları, "grup=değer,..." biçiminde; listede olmayan grup "default"u alır.
+# Read preference: primary | primaryPreferred | secondary | secondaryPreferred | nearest
+MONGO_READ_PREFERENCES = os.environ.get('MONGO_READ_PREFERENCES', 'default=primary')
+# Secondary okumalarında kabul edilen en fazla gecikme (MongoDB alt sınırı 90 sn)
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
+# Sunucu tarafı sorgu bütçesi (maxTimeMS, 0 = sınırsız)
+MONGO_MAX_TIME_MS = os.environ.get(
+    'MONGO_MAX_TIME_MS', 'default=0,leaderboard=500,talismans=500,statistics=2000,spells=2000'
+)
+
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+def available_compressors(names: str) -> List[str]:
+    # Sunucu listedeki ilk ortak algoritmayı seçer; kurulu olmayan kütüphaneler listeden çıkarılır
+    requested = [name.strip() for name in names.split(",") if name.strip()]
+    return [
+        name for name in requested
+        if name in COMPRESSOR_MODULES and importlib.util.find_spec(COMPRESSOR_MODULES[name]) is not None
+    ]
+
+def route_settings(value: str) -> Dict[str, str]:
+    pairs = (item.split("=", 1) for item in value.replace(" ", "").split(",") if item)
+    return {name: setting for name, setting in pairs}
+
+SECONDARY_READ_MODES = {
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def read_preference(mode: str):
+    if mode == "primary":
+        return ReadPreference.PRIMARY
+    if mode not in SECONDARY_READ_MODES:
+        raise ValueError(f"Geçersiz read preference: {mode}")
+    return SECONDARY_READ_MODES[mode](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+mongo_compressors = available_compressors(MONGO_COMPRESSORS)
+# Tarihler BSON date olarak yazılır; tz_aware ile okunurken UTC'li datetime döner
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    **({"compressors": ",".join(mongo_compressors)} if mongo_compressors else {}),
+    # Havuz sayaçları /api/admin/mongo için metrikler kapalıyken de tutulur
+    event_listeners=[MongoCommandMetrics(), mongo_pool_metrics] if METRICS_ENABLED else [mongo_pool_metrics],
+)
 db = client[os.environ['DB_NAME']]
 
+class ReadRoute:
+    # Bir uç nokta grubunun okumaları: koleksiyonlar grubun read preference'ıyla açılır,
+    # sorgular max_time_ms bütçesini taşır. Yazılar ve yazı sonrası okumalar her zaman db üzerinden (primary).
+    def __init__(self, name: str):
+        preferences = route_settings(MONGO_READ_PREFERENCES)
+        budgets = route_settings(MONGO_MAX_TIME_MS)
+        self.name = name
+        self.mode = preferences.get(name, preferences.get("default", "primary"))
+        self.read_preference = read_preference(self.mode)
+        self.max_time_ms = int(budgets.get(name, budgets.get("default", "0")))
+
+    def collection(self, name: str):
+        return db.get_collection(name, read_preference=self.read_preference)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "readPreference": self.mode,
+            "maxStalenessSeconds": None if self.mode == "primary" else MONGO_MAX_STALENESS_SECONDS,
+            "maxTimeMS": self.max_time_ms,
+        }
+
+# Ana kayıtlar (liderlik indeksi, tılsım kataloğu) bellekte; buradakiler istek başına yapılan okumalar
+READ_ROUTES = {name: ReadRoute(name) for name in ("leaderboard", "talismans", "statistics", "spells", "export")}
+
 # Şifreleme
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# BCRYPT_ROUNDS değişirse eski hash'ler girişte yeniden hesaplanır (verify_and_update)
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt event loop'u bloklamasın diye ayrı process havuzunda çalışır
+HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+HASH_POOL_QUEUE_SIZE = int(os.environ.get('HASH_POOL_QUEUE_SIZE', '32'))
+
+# Tılsım kataloğu HTTP önbellek süresi (ETag ile yeniden doğrulanır)
+TALISMAN_CACHE_MAX_AGE = int(os.environ.get('TALISMAN_CACHE_MAX_AGE', '60'))
+
+# Doğrulanmış token önbelleği
+TOKEN_CACHE_MAXSIZE = int(os.environ.get('TOKEN_CACHE_MAXSIZE', '50000'))
+
+# Liderlik tablosu sayfa boyutu üst sınırı
+LEADERBOARD_MAX_LIMIT = int(os.environ.get('LEADERBOARD_MAX_LIMIT', '100'))
+
+# Büyü listesi sayfalama
+SPELL_PAGE_DEFAULT_LIMIT = int(os.environ.get('SPELL_PAGE_DEFAULT_LIMIT', '100'))
+SPELL_PAGE_MAX_LIMIT = int(os.environ.get('SPELL_PAGE_MAX_LIMIT', '500'))
+# Parametresiz GET /api/spells'in tek yanıttaki üst sınırı; fazlası X-Next-Cursor ile alınır
+SPELL_LEGACY_LIST_LIMIT = int(os.environ.get('SPELL_LEGACY_LIST_LIMIT', '1000'))
+SPELL_STREAM_BATCH_SIZE = int(os.environ.get('SPELL_STREAM_BATCH_SIZE', '100'))
+
+# İstatistik aralığı (gün)
+STATISTICS_DEFAULT_DAYS = int(os.environ.get('STATISTICS_DEFAULT_DAYS', '30'))
+STATISTICS_MAX_DAYS = int(os.environ.get('STATISTICS_MAX_DAYS', '366'))
+
+# Toplu büyü içe aktarma
+SPELL_IMPORT_CHUNK_SIZE = int(os.environ.get('SPELL_IMPORT_CHUNK_SIZE', '500'))
+SPELL_IMPORT_MAX_ERRORS = int(os.environ.get('SPELL_IMPORT_MAX_ERRORS', '100'))
+SPELL_IMPORT_MAX_LINE_BYTES = int(os.environ.get('SPELL_IMPORT_MAX_LINE_BYTES', str(64 * 1024)))
+
+# Tamamlanma olay günlüğü: sync (sayaçlar istek içinde, yan etkiler yanıttan sonra) |
+# deferred (arka plandaki kompaktör işler)
+COMPLETION_WRITE_MODE = os.environ.get('COMPLETION_WRITE_MODE', 'sync').lower()
+COMPLETION_COMPACT_INTERVAL = float(os.environ.get('COMPLETION_COMPACT_INTERVAL', '1.0'))
+COMPLETION_COMPACT_BATCH_SIZE = int(os.environ.get('COMPLETION_COMPACT_BATCH_SIZE', '500'))
+COMPLETION_CLAIM_SECONDS = float(os.environ.get('COMPLETION_CLAIM_SECONDS', '60'))
+
+# Günlük/haftalık isCompleted sıfırlama zamanlayıcısı (UTC dönem sınırlarında)
+SPELL_RESET_ENABLED = os.environ.get('SPELL_RESET_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SPELL_RESET_BATCH_SIZE = int(os.environ.get('SPELL_RESET_BATCH_SIZE', '1000'))
+SPELL_RESET_CHECK_INTERVAL = float(os.environ.get('SPELL_RESET_CHECK_INTERVAL', '900'))
+SPELL_RESET_LEASE_SECONDS = float(os.environ.get('SPELL_RESET_LEASE_SECONDS', '120'))
+# scheduler_runs kayıtlarının saklanma süresi (TTL index)
+SCHEDULER_RUNS_RETENTION_DAYS = int(os.environ.get('SCHEDULER_RUNS_RETENTION_DAYS', '30'))
+
+# Çok süreçli (uvicorn --workers) önbellek tutarlılığı: auto | changestream | poll | off
+# auto: replika setinde change stream, tek mongod'da capped "invalidations" koleksiyonu
+INVALIDATION_MODE = os.environ.get('INVALIDATION_MODE', 'auto').lower()
+INVALIDATION_CAPPED_BYTES = int(os.environ.get('INVALIDATION_CAPPED_BYTES', str(16 * 1024 * 1024)))
+INVALIDATION_RETRY_INTERVAL = float(os.environ.get('INVALIDATION_RETRY_INTERVAL', '1.0'))
+
+# Kimliği doğrulanmış kullanıcı önbelleği
+USER_CACHE_MAXSIZE = int(os.environ.get('USER_CACHE_MAXSIZE', '10000'))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
 
 # JWT ayarları
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'akademik-buyucu-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 gün
 
+# Yönetim uç noktaları için paylaşılan anahtar (X-Admin-Token); boşsa yönetim kapalı
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+# İstek profilleme: X-Profile başlığı (yönetici) veya her N istekten biri (0 = kapalı)
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', '0'))
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.002'))
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', str(ROOT_DIR / 'profiles')))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', '200'))
+PROFILE_MAX_BYTES = int(os.environ.get('PROFILE_MAX_BYTES', str(50 * 1024 * 1024)))
+
 # Security
 security = HTTPBearer()
 
+# API'ye dönen kullanıcı belgesi; appliedEvents olay günlüğünün iç durumudur
+USER_PROJECTION = {"_id": 0, "password": 0, "appliedEvents": 0}
+
+# Index tanımları
+# Her sıcak sorgunun arkasında bir index olmalı; lifespan bunları idempotent olarak uygular.
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, int]]
+    options: Dict[str, Any]
+
+class HotQuery(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+
+INDEX_REGISTRY: List[IndexSpec] = [
+    IndexSpec("users", [("id", ASCENDING)], {"name": "users_id_unique", "unique": True}),
+    IndexSpec("users", [("email", ASCENDING)], {"name": "users_email_unique", "unique": True}),
+    IndexSpec("users", [("xp", DESCENDING)], {"name": "users_xp_desc"}),
+    IndexSpec("spells", [("userId", ASCENDING), ("id", ASCENDING)], {"name": "spells_userId_id"}),
+    IndexSpec(
+        "spells",
+        [("userId", ASCENDING), ("createdAt", ASCENDING), ("id", ASCENDING)],
+        {"name": "spells_userId_createdAt_id"},
+    ),
+    IndexSpec(
+        "spells",
+        [("repeatType", ASCENDING), ("isCompleted", ASCENDING), ("lastCompletedDay", ASCENDING)],
+        {"name": "spells_reset"},
+    ),
+    IndexSpec(
+        "user_talismans",
+        [("userId", ASCENDING), ("talismanId", ASCENDING)],
+        {"name": "user_talismans_userId_talismanId_unique", "unique": True},
+    ),
+    IndexSpec(
+        "xp_buckets",
+        [("period", ASCENDING), ("periodKey", ASCENDING), ("userId", ASCENDING)],
+        {"name": "xp_buckets_period_user_unique", "unique": True},
+    ),
+    IndexSpec(
+        "xp_buckets",
+        [("period", ASCENDING), ("periodKey", ASCENDING), ("xp", DESCENDING), ("userId", ASCENDING)],
+        {"name": "xp_buckets_period_xp_desc"},
+    ),
+    IndexSpec("xp_buckets", [("expiresAt", ASCENDING)], {"name": "xp_buckets_ttl", "expireAfterSeconds": 0}),
+    IndexSpec("revoked_tokens", [("expiresAt", ASCENDING)], {"name": "revoked_tokens_ttl", "expireAfterSeconds": 0}),
+    IndexSpec(
+        "scheduler_runs",
+        [("startedAt", ASCENDING)],
+        {"name": "scheduler_runs_ttl", "expireAfterSeconds": SCHEDULER_RUNS_RETENTION_DAYS * 24 * 3600},
+    ),
+    IndexSpec(
+        "user_daily_stats",
+        [("userId", ASCENDING), ("day", ASCENDING)],
+        {"name": "user_daily_stats_userId_day_unique", "unique": True},
+    ),
+    IndexSpec(
+        "completion_events",
+        [("spellId", ASCENDING), ("day", ASCENDING)],
+        {"name": "completion_events_spellId_day_unique", "unique": True},
+    ),
+    IndexSpec("completion_events", [("userId", ASCENDING), ("day", ASCENDING)], {"name": "completion_events_userId_day"}),
+    IndexSpec(
+        "completion_events",
+        [("pending", ASCENDING), ("createdAt", ASCENDING)],
+        {"name": "completion_events_pending", "partialFilterExpression": {"pending": True}},
+    ),
+]
+
+# Başlangıçta explain() ile plan kontrolü yapılan sorgular
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("get_current_user", "users", {"id": "__plan_check__"}),
+    HotQuery("login", "users", {"email": "plan-check@example.com"}),
+    HotQuery("get_spells", "spells", {"userId": "__plan_check__"}, [("createdAt", ASCENDING), ("id", ASCENDING)]),
+    HotQuery("complete_spell", "spells", {"id": "__plan_check__", "userId": "__plan_check__"}),
+    HotQuery("user_talisman", "user_talismans", {"userId": "__plan_check__", "talismanId": "__plan_check__"}),
+    HotQuery("get_leaderboard", "users", {}, [("xp", DESCENDING)]),
+    HotQuery(
+        "get_user_statistics", "user_daily_stats",
+        {"userId": "__plan_check__", "day": {"$gte": "2020-01-01", "$lte": "2020-01-31"}},
+    ),
+    HotQuery(
+        "get_user_statistics_spells", "spells",
+        {"userId": "__plan_check__", "$or": [
+            {"createdAt": {"$lt": datetime(2020, 2, 1, tzinfo=timezone.utc)}}, {"createdAt": {"$type": "string"}}
+        ]},
+    ),
+    HotQuery("completion_compactor", "completion_events", {"pending": True}, [("createdAt", ASCENDING)]),
+    HotQuery(
+        "spell_reset", "spells",
+        {"repeatType": "DAILY", "isCompleted": True, "lastCompletedDay": {"$not": {"$gte": "2020-01-01"}}},
+    ),
+    HotQuery(
+        "get_leaderboard_window", "xp_buckets",
+        {"period": "week", "periodKey": "__plan_check__"},
+        [("xp", DESCENDING), ("userId", ASCENDING)],
+    ),
+]
+
+# off | warn | strict (strict: COLLSCAN varsa uygulama başlamaz)
+INDEX_PLAN_CHECK = os.environ.get('INDEX_PLAN_CHECK', 'warn').lower()
+
+async def ensure_indexes():
+    by_collection: Dict[str, List[IndexModel]] = {}
+    for spec in INDEX_REGISTRY:
+        by_collection.setdefault(spec.collection, []).append(IndexModel(spec.keys, **spec.options))
+    for collection, models in by_collection.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # Örn. mevcut tekrar eden email'ler unique index'i engelliyorsa
+            logger.error("%s index'leri oluşturulamadı: %s", collection, e)
+            if INDEX_PLAN_CHECK == 'strict':
+                raise
+
+def _plan_stages(plan: Any):
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+async def check_query_plans() -> List[str]:
+    collscans = []
+    for query in HOT_QUERIES:
+        cursor = db[query.collection].find(query.filter).limit(1)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        explain = await cursor.explain()
+        winning_plan = explain.get('queryPlanner', {}).get('winningPlan', {})
+        if 'COLLSCAN' in set(_plan_stages(winning_plan)):
+            collscans.append(query.name)
+    return collscans
+
+async def apply_index_registry():
+    await ensure_indexes()
+    if INDEX_PLAN_CHECK == 'off':
+        return
+    collscans = await check_query_plans()
+    if not collscans:
+        logger.info("Index kontrolü tamam: %d sıcak sorgu index kullanıyor.", len(HOT_QUERIES))
+        return
+    message = "COLLSCAN yapan sorgular: " + ", ".join(collscans)
+    if INDEX_PLAN_CHECK == 'strict':
+        raise RuntimeError(message)
+    logger.warning(message)
+
 # --- YENİ EKLENEN KISIM (LIFESPAN) ---
 # on_event yerine bu yapı kullanılıyor
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Uygulama açılırken yapılacak işlemler (Buraya log atabilirsin)
-    logger.info("Veritabanı bağlantısı başlatıldı.")
+    logger.info("Veritabanı bağlantısı başlatıldı (havuz %d-%d, sıkıştırma: %s, okuma: %s).",
+                MONGO_MIN_POOL_SIZE, MONGO_MAX_POOL_SIZE, ",".join(mongo_compressors) or "yok",
+                {name: route.mode for name, route in READ_ROUTES.items()})
+    await apply_index_registry()
+    await warn_unmigrated_dates()
+    await invalidation_bus.prepare()
+    await talisman_catalog.refresh()
+    await leaderboard_index.load()
+    await token_revocations.load()
+    invalidation_bus.start()
+    hashing_pool.start()
+    completion_compactor.start()
+    if SPELL_RESET_ENABLED:
+        spell_reset_scheduler.start()
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag()) if METRICS_ENABLED else None
     yield
     # Uygulama kapanırken yapılacak işlemler
+    if lag_monitor is not None:
+        lag_monitor.cancel()
+    await completion_compactor.stop()
+    await spell_reset_scheduler.stop()
+    await invalidation_bus.stop()
+    hashing_pool.shutdown()
+    logger.info("Kullanıcı önbelleği: %s", user_cache.stats())
+    logger.info("Token önbelleği: %s", token_cache.stats())
     client.close()
     logger.info("Veritabanı bağlantısı kapatıldı.")
 
@@ -56,6 +614,24 @@ class RepeatType(str, Enum):
     DAILY = "DAILY"
     WEEKLY = "WEEKLY"
 
+class LeaderboardWindow(str, Enum):
+    ALL = "all"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class SpellListFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+class SpellExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class StatisticsGranularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+
 class TalismanCondition(str, Enum):
     FIRST_SPELL = "FIRST_SPELL"
     LEVEL_5 = "LEVEL_5"
@@ -99,6 +675,7 @@ class Spell(BaseModel):
     xpReward: int
     userId: str
     completedDates: List[str] = []
+    completionCount: int = 0
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class SpellCreate(BaseModel):
@@ -107,6 +684,25 @@ class SpellCreate(BaseModel):
     repeatType: RepeatType
     xpReward: int = 10
 
+class SpellBatchComplete(BaseModel):
+    spellIds: List[str] = Field(..., min_length=1, max_length=100)
+
+class SpellCompletionResult(BaseModel):
+    spellId: str
+    completed: bool
+    xpGained: int = 0
+    error: Optional[str] = None
+
+class SpellImportError(BaseModel):
+    line: int
+    error: str
+
+class SpellImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[SpellImportError]
+    errorsTruncated: bool = False
+
 class SpellUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -121,6 +717,10 @@ class Talisman(BaseModel):
     iconUrl: str
     condition: TalismanCondition
 
+class PasswordChange(BaseModel):
+    currentPassword: str
+    newPassword: str
+
 class UserTalisman(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -129,10 +729,17 @@ class UserTalisman(BaseModel):
     unlockedAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class LeaderboardEntry(BaseModel):
+    rank: Optional[int] = None
     username: str
     xp: int
     level: int
 
+class LeaderboardPosition(BaseModel):
+    rank: int
+    total: int
+    entry: LeaderboardEntry
+    neighbours: List[LeaderboardEntry]
+
 class UserStats(BaseModel):
     totalSpellsCompleted: int
     currentStreak: int
@@ -141,89 +748,787 @@ class UserStats(BaseModel):
     level: int
     unlockedTalismans: int
 
+class StatisticsPeriod(BaseModel):
+    period: str
+    start: date
+    completions: int
+    xp: int
+
+class SpellCompletionRate(BaseModel):
+    spellId: str
+    title: str
+    repeatType: RepeatType
+    completions: int
+    expected: int
+    rate: float
+
+class UserStatistics(BaseModel):
+    start: date
+    end: date
+    granularity: StatisticsGranularity
+    totalCompletions: int
+    totalXp: int
+    periods: List[StatisticsPeriod]
+    repeatTypes: Dict[str, int]
+    spells: List[SpellCompletionRate]
+
 # Yardımcı fonksiyonlar
+# Not: bu üç fonksiyon HashingPool içinde ayrı process'lerde çalışır, modül seviyesinde kalmalı
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Hash eski bcrypt maliyetiyle üretildiyse yeni hash'i de döndürür
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+class HashingPool:
+    # Sınırlı kuyruklu process havuzu: kapasite doluysa iş biriktirmek yerine hemen 503 döner
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        # fork yerine spawn: motor'un thread'leri varken fork etmek kilitlenmeye yol açabilir
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, func, *args):
+        if self.pending >= self.capacity:
+            raise HTTPException(
+                status_code=503,
+                detail="Sunucu şu anda yoğun, lütfen tekrar deneyin",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            # Havuz başlatılmadıysa (ör. script kullanımı) varsayılan thread havuzuna düşer
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except BrokenProcessPool:
+            logger.error("Hash havuzu çöktü, yeniden başlatılıyor.")
+            self.shutdown()
+            self.start()
+            raise HTTPException(status_code=503, detail="Sunucu şu anda yoğun, lütfen tekrar deneyin")
+        finally:
+            self.pending -= 1
+            hash_duration.observe((func.__name__,), time.perf_counter() - started)
+
+hashing_pool = HashingPool(HASH_POOL_WORKERS, HASH_POOL_QUEUE_SIZE)
+
+class UserCache:
+    # TTL + LRU: db.users'a yazan her yer kaydı put() veya evict() ile güncel tutmalı
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: User):
+        if self.maxsize <= 0:
+            return
+        self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def refresh(self, user: User):
+        # Başka süreçten gelen güncel kayıt: sadece zaten önbellekteyse yenilenir
+        if user.id in self._entries:
+            self.put(user)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+user_cache = UserCache(USER_CACHE_MAXSIZE, USER_CACHE_TTL_SECONDS)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # iat ondalıklı saniye: şifre değişikliğiyle aynı saniyede üretilen eski token'lar da iptal edilebilsin
+    to_encode.update({"exp": expire, "iat": time.time()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+def token_digest(token: str) -> str:
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+class VerifiedToken(NamedTuple):
+    digest: str
+    user_id: str
+    expires_at: float
+    issued_at: float
+
+class TokenCache:
+    # Doğrulanmış token özetleri -> (user id, exp); aynı token için HMAC doğrulaması tekrarlanmaz
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, VerifiedToken]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: str) -> Optional[VerifiedToken]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return entry
+
+    def put(self, entry: VerifiedToken):
+        if self.maxsize <= 0:
+            return
+        self._entries[entry.digest] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict(self, digest: str):
+        self._entries.pop(digest, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+token_cache = TokenCache(TOKEN_CACHE_MAXSIZE)
+
+class TokenRevocations:
+    # İptal edilen token özetleri ve kullanıcı bazlı "bu andan önce üretilenler geçersiz" sınırları.
+    # Kalıcı kopya revoked_tokens koleksiyonunda (TTL ile temizlenir), kontrol tamamen bellekte.
+    def __init__(self):
+        self.tokens: Dict[str, float] = {}
+        self.user_cutoffs: Dict[str, float] = {}
+
+    async def load(self):
+        now = time.time()
+        tokens, user_cutoffs = {}, {}
+        async for doc in db.revoked_tokens.find({"expiresAt": {"$gt": datetime.now(timezone.utc)}}):
+            self._apply(doc, tokens, user_cutoffs)
+        self.tokens, self.user_cutoffs = tokens, user_cutoffs
+        logger.info("İptal listesi yüklendi: %d token, %d kullanıcı (%.1f ms)",
+                    len(tokens), len(user_cutoffs), (time.time() - now) * 1000)
+
+    @staticmethod
+    def _apply(doc: dict, tokens: Dict[str, float], user_cutoffs: Dict[str, float]):
+        kind, _, key = doc['_id'].partition(":")
+        if kind == "token":
+            tokens[key] = doc['expiresAt'].timestamp()
+        elif kind == "user":
+            user_cutoffs[key] = max(user_cutoffs.get(key, 0.0), doc['notBefore'])
+
+    def apply(self, doc: dict):
+        self._apply(doc, self.tokens, self.user_cutoffs)
+
+    def is_revoked(self, token: VerifiedToken) -> bool:
+        if token.digest in self.tokens:
+            return True
+        cutoff = self.user_cutoffs.get(token.user_id)
+        return cutoff is not None and token.issued_at < cutoff
+
+    async def revoke_token(self, token: VerifiedToken):
+        expires_at = datetime.fromtimestamp(token.expires_at, timezone.utc)
+        await db.revoked_tokens.update_one(
+            {"_id": f"token:{token.digest}"},
+            {"$set": {"expiresAt": expires_at}},
+            upsert=True
+        )
+        self.tokens[token.digest] = token.expires_at
+        self._prune()
+        await invalidation_bus.publish("revoked_tokens", token.digest, {"_id": f"token:{token.digest}", "expiresAt": expires_at})
+
+    async def revoke_user(self, user_id: str, not_before: float):
+        # not_before öncesinde üretilmiş tüm token'lar en geç ömürleri dolunca zaten geçersiz olur
+        expires_at = datetime.fromtimestamp(not_before, timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        await db.revoked_tokens.update_one(
+            {"_id": f"user:{user_id}"},
+            {"$max": {"notBefore": not_before}, "$set": {"expiresAt": expires_at}},
+            upsert=True
+        )
+        self.user_cutoffs[user_id] = max(self.user_cutoffs.get(user_id, 0.0), not_before)
+        await invalidation_bus.publish("revoked_tokens", user_id, {
+            "_id": f"user:{user_id}", "notBefore": self.user_cutoffs[user_id], "expiresAt": expires_at
+        })
+
+    def _prune(self):
+        now = time.time()
+        for digest in [digest for digest, expires_at in self.tokens.items() if expires_at <= now]:
+            del self.tokens[digest]
+
+token_revocations = TokenRevocations()
+
+async def get_current_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> VerifiedToken:
+    token = credentials.credentials
+    digest = token_digest(token)
+    verified = token_cache.get(digest)
+    if verified is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token süresi dolmuş")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Token geçersiz")
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Token geçersiz")
-    except jwt.ExpiredSignatureError:
+        # iat'siz eski token'lar her kullanıcı bazlı iptalden etkilenir
+        verified = VerifiedToken(digest, user_id, float(payload["exp"]), float(payload.get("iat", 0)))
+        token_cache.put(verified)
+    elif verified.expires_at <= time.time():
+        token_cache.evict(digest)
         raise HTTPException(status_code=401, detail="Token süresi dolmuş")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Token geçersiz")
     
-    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if token_revocations.is_revoked(verified):
+        raise HTTPException(status_code=401, detail="Token iptal edilmiş")
+    return verified
+
+async def get_current_user(token: VerifiedToken = Depends(get_current_token)) -> User:
+    user_id = token.user_id
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user
+    
+    user_doc = await db.users.find_one({"id": user_id}, USER_PROJECTION)
     if user_doc is None:
         raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
     
-    if isinstance(user_doc.get('createdAt'), str):
-        user_doc['createdAt'] = datetime.fromisoformat(user_doc['createdAt'])
-    
-    return User(**user_doc)
+    user = User(**user_doc)
+    user_cache.put(user)
+    return user
+
+XP_PER_LEVEL = 100
 
 def calculate_level(xp: int) -> int:
     # Her 100 XP'de bir seviye atlama
-    return (xp // 100) + 1
-
-async def check_and_unlock_talismans(user: User):
-    # Tılsımları kontrol et ve kilidi aç
-    conditions_met = []
-    
-    if user.totalSpellsCompleted >= 1:
-        conditions_met.append(TalismanCondition.FIRST_SPELL)
-    if user.level >= 5:
-        conditions_met.append(TalismanCondition.LEVEL_5)
-    if user.level >= 10:
-        conditions_met.append(TalismanCondition.LEVEL_10)
-    if user.currentStreak >= 7:
-        conditions_met.append(TalismanCondition.STREAK_7)
-    if user.currentStreak >= 30:
-        conditions_met.append(TalismanCondition.STREAK_30)
-    if user.totalSpellsCompleted >= 10:
-        conditions_met.append(TalismanCondition.SPELLS_10)
-    if user.totalSpellsCompleted >= 50:
-        conditions_met.append(TalismanCondition.SPELLS_50)
-    if user.totalSpellsCompleted >= 100:
-        conditions_met.append(TalismanCondition.SPELLS_100)
-    
-    # Tüm tılsımları getir
-    talismans = await db.talismans.find({}, {"_id": 0}).to_list(1000)
-    
-    for talisman in talismans:
-        if talisman['condition'] in [c.value for c in conditions_met]:
-            # Kullanıcının bu tılsımı var mı kontrol et
-            existing = await db.user_talismans.find_one({
-                "userId": user.id,
-                "talismanId": talisman['id']
-            })
-            
-            if not existing:
-                # Yeni tılsım kilidi aç
-                user_talisman = UserTalisman(
-                    userId=user.id,
-                    talismanId=talisman['id']
-                )
-                doc = user_talisman.model_dump()
-                doc['unlockedAt'] = doc['unlockedAt'].isoformat()
-                await db.user_talismans.insert_one(doc)
+    return (xp // XP_PER_LEVEL) + 1
+
+APPLIED_EVENTS_WINDOW = 200
+
+def next_streak(user: User, today: str, yesterday: str) -> int:
+    # completion_update_pipeline'daki streak kuralının Python karşılığı
+    if user.lastCompletionDate and user.lastCompletionDate > today:
+        return user.currentStreak
+    if user.lastCompletionDate == yesterday:
+        return user.currentStreak + 1
+    if user.lastCompletionDate == today:
+        return max(user.currentStreak, 1)
+    return 1
+
+def completion_update_pipeline(
+    xp_gained: int, completions: int, today: str, yesterday: str, event_ids: List[str]
+) -> List[dict]:
+    # XP, seviye ve streak sunucuda, belgenin güncel hali üzerinden hesaplanır (yarış durumu yok).
+    # İlk $set aşamasındaki alan referansları güncelleme öncesi değerleri görür. Geç işlenen eski
+    # bir günün olayı kullanıcıyı geriye sarmaz: son tamamlanma günü ve streak korunur.
+    return [
+        {"$set": {
+            "xp": {"$add": [{"$ifNull": ["$xp", 0]}, xp_gained]},
+            "totalSpellsCompleted": {"$add": [{"$ifNull": ["$totalSpellsCompleted", 0]}, completions]},
+            "currentStreak": {"$switch": {
+                "branches": [
+                    {"case": {"$gt": ["$lastCompletionDate", today]},
+                     "then": {"$ifNull": ["$currentStreak", 0]}},
+                    {"case": {"$eq": ["$lastCompletionDate", yesterday]},
+                     "then": {"$add": [{"$ifNull": ["$currentStreak", 0]}, 1]}},
+                    {"case": {"$eq": ["$lastCompletionDate", today]},
+                     "then": {"$max": [{"$ifNull": ["$currentStreak", 0]}, 1]}},
+                ],
+                "default": 1
+            }},
+            "lastCompletionDate": {"$max": ["$lastCompletionDate", {"$literal": today}]},
+            # İşlenen olayların son penceresi: aynı olay ikinci kez sayılmaz
+            "appliedEvents": {"$slice": [
+                {"$concatArrays": [{"$ifNull": ["$appliedEvents", []]}, {"$literal": event_ids}]},
+                -APPLIED_EVENTS_WINDOW
+            ]},
+        }},
+        {"$set": {
+            "level": {"$add": [{"$toInt": {"$floor": {"$divide": ["$xp", XP_PER_LEVEL]}}}, 1]},
+            "maxStreak": {"$max": [{"$ifNull": ["$maxStreak", 0]}, "$currentStreak"]},
+        }},
+    ]
+
+# Tamamlanma geçmişi bitmap'i
+# Günler COMPLETION_EPOCH'tan itibaren 64 bitlik kelimelere bölünür; spell belgesinde sadece dolu
+# kelimeler {"<kelime no>": Int64} olarak "completionBits" altında saklanır. Bir günü işaretlemek
+# tek bir atomik $bit güncellemesidir. Eski belgelerdeki "completedDates" dizisi okumada birleştirilir
+# ve `python server.py migrate-completions` ile bitmap'e taşınır.
+COMPLETION_EPOCH = date(2020, 1, 1)
+COMPLETION_WORD_BITS = 64
+_WORD_MASK = (1 << COMPLETION_WORD_BITS) - 1
+
+def completion_slot(day: date) -> Tuple[str, int]:
+    offset = (day - COMPLETION_EPOCH).days
+    if offset < 0:
+        raise ValueError(f"{day} tarihi {COMPLETION_EPOCH} öncesinde")
+    word, bit = divmod(offset, COMPLETION_WORD_BITS)
+    return str(word), bit
+
+def to_int64(word: int) -> Int64:
+    # BSON long işaretli: 63. bit negatif sayı olarak saklanır
+    return Int64(word - (1 << 64) if word >= (1 << 63) else word)
+
+class CompletionBitmap:
+    def __init__(self, words: Optional[Dict[int, int]] = None):
+        self.words: Dict[int, int] = words or {}
+
+    @classmethod
+    def from_doc(cls, spell: dict) -> "CompletionBitmap":
+        bitmap = cls({int(k): int(v) & _WORD_MASK for k, v in (spell.get('completionBits') or {}).items()})
+        for value in spell.get('completedDates') or []:
+            bitmap.add(date.fromisoformat(value))
+        return bitmap
+
+    @classmethod
+    def from_days(cls, days: Iterable[date]) -> "CompletionBitmap":
+        bitmap = cls()
+        for day in days:
+            bitmap.add(day)
+        return bitmap
+
+    def add(self, day: date):
+        word, bit = completion_slot(day)
+        self.words[int(word)] = self.words.get(int(word), 0) | (1 << bit)
+
+    def __contains__(self, day: date) -> bool:
+        if day < COMPLETION_EPOCH:
+            return False
+        word, bit = completion_slot(day)
+        return bool(self.words.get(int(word), 0) >> bit & 1)
+
+    def __len__(self) -> int:
+        return sum(word.bit_count() for word in self.words.values())
+
+    def count_range(self, start: date, end: date) -> int:
+        # [start, end] aralığındaki (iki uç dahil) tamamlanma sayısı
+        start = max(start, COMPLETION_EPOCH)
+        if end < start:
+            return 0
+        first = (start - COMPLETION_EPOCH).days
+        last = (end - COMPLETION_EPOCH).days
+        total = 0
+        for index in range(first // COMPLETION_WORD_BITS, last // COMPLETION_WORD_BITS + 1):
+            word = self.words.get(index)
+            if not word:
+                continue
+            low = max(first - index * COMPLETION_WORD_BITS, 0)
+            high = min(last - index * COMPLETION_WORD_BITS, COMPLETION_WORD_BITS - 1)
+            total += (word >> low & ((1 << (high - low + 1)) - 1)).bit_count()
+        return total
+
+    def streak_ending(self, day: date) -> int:
+        # day dahil geriye doğru kesintisiz tamamlanan gün sayısı
+        if day not in self:
+            return 0
+        index, bit = divmod((day - COMPLETION_EPOCH).days, COMPLETION_WORD_BITS)
+        streak = 0
+        while index >= 0:
+            window = (1 << (bit + 1)) - 1
+            gaps = ~self.words.get(index, 0) & window
+            if gaps:
+                return streak + bit - (gaps.bit_length() - 1)
+            streak += bit + 1
+            index, bit = index - 1, COMPLETION_WORD_BITS - 1
+        return streak
+
+    def days(self) -> Iterator[date]:
+        for index in sorted(self.words):
+            word = self.words[index]
+            while word:
+                low_bit = word & -word
+                yield COMPLETION_EPOCH + timedelta(days=index * COMPLETION_WORD_BITS + low_bit.bit_length() - 1)
+                word ^= low_bit
+
+    def iso_dates(self) -> List[str]:
+        return [day.isoformat() for day in self.days()]
+
+    def to_bson(self) -> Dict[str, Int64]:
+        return {str(index): to_int64(word) for index, word in self.words.items() if word}
+
+def expand_completions(spell: dict) -> dict:
+    # API yanıtı için bitmap'i eski "completedDates" listesine çevirir
+    bits = spell.pop('completionBits', None)
+    if bits or 'completedDates' in spell:
+        spell['completedDates'] = CompletionBitmap.from_doc(
+            {"completionBits": bits, "completedDates": spell.get('completedDates')}
+        ).iso_dates()
+    return spell
+
+def count_completions(spell: dict) -> dict:
+    # Liste yanıtı için: tarihler açılmadan bitmap popcount'u (eski dizi dahil) döner
+    bitmap = CompletionBitmap.from_doc(
+        {"completionBits": spell.pop('completionBits', None), "completedDates": spell.pop('completedDates', None)}
+    )
+    spell['completionCount'] = len(bitmap)
+    return spell
+
+def not_completed_on_filter(day: date) -> Dict[str, Any]:
+    # Hem bitmap'te hem eski dizide bu gün işaretli değilse eşleşir
+    word, bit = completion_slot(day)
+    return {
+        "completedDates": {"$ne": day.isoformat()},
+        f"completionBits.{word}": {"$not": {"$bitsAnySet": [bit]}},
+    }
+
+def mark_completed_update(day: date) -> Dict[str, Any]:
+    # isCompleted dönem sınırında SpellResetScheduler tarafından lastCompletedDay'e bakılarak sıfırlanır
+    word, bit = completion_slot(day)
+    return {
+        "$bit": {f"completionBits.{word}": {"or": to_int64(1 << bit)}},
+        "$set": {"isCompleted": True},
+        "$max": {"lastCompletedDay": day.isoformat()},
+    }
+
+# Tılsım kuralları: koşul -> (kullanıcı metriği, eşik)
+TALISMAN_RULES: Dict[TalismanCondition, Tuple[str, int]] = {
+    TalismanCondition.FIRST_SPELL: ("totalSpellsCompleted", 1),
+    TalismanCondition.LEVEL_5: ("level", 5),
+    TalismanCondition.LEVEL_10: ("level", 10),
+    TalismanCondition.STREAK_7: ("currentStreak", 7),
+    TalismanCondition.STREAK_30: ("currentStreak", 30),
+    TalismanCondition.SPELLS_10: ("totalSpellsCompleted", 10),
+    TalismanCondition.SPELLS_50: ("totalSpellsCompleted", 50),
+    TalismanCondition.SPELLS_100: ("totalSpellsCompleted", 100),
+}
+
+class TalismanRuleEngine:
+    # Kurallar metrik başına sıralı eşik tablolarına bir kez derlenir; yeni geçilen eşikler
+    # eski ve yeni değer arasında bisect ile bulunur.
+    def __init__(self, rules: Dict[TalismanCondition, Tuple[str, int]]):
+        tables: Dict[str, List[Tuple[int, TalismanCondition]]] = {}
+        for condition, (metric, threshold) in rules.items():
+            tables.setdefault(metric, []).append((threshold, condition))
+        self.thresholds: Dict[str, List[int]] = {}
+        self.conditions: Dict[str, List[TalismanCondition]] = {}
+        for metric, entries in tables.items():
+            entries.sort(key=lambda entry: entry[0])
+            self.thresholds[metric] = [threshold for threshold, _ in entries]
+            self.conditions[metric] = [condition for _, condition in entries]
+
+    def newly_met(self, before: Dict[str, int], after: Dict[str, int]) -> List[TalismanCondition]:
+        met = []
+        for metric, thresholds in self.thresholds.items():
+            low = bisect_right(thresholds, before.get(metric, 0))
+            high = bisect_right(thresholds, after.get(metric, 0))
+            met.extend(self.conditions[metric][low:high])
+        return met
+
+talisman_rules = TalismanRuleEngine(TALISMAN_RULES)
+
+def talisman_metrics(user: User) -> Dict[str, int]:
+    return {
+        "totalSpellsCompleted": user.totalSpellsCompleted,
+        "level": user.level,
+        "currentStreak": user.currentStreak,
+    }
+
+class TalismanCatalog:
+    # Katalog sadece /api/init-data ile değişir: bellekte tutulur, önceden serileştirilir ve
+    # içeriğin hash'i sürüm/ETag olarak kullanılır. Kataloğa yazan her yer refresh() çağırmalı.
+    def __init__(self):
+        self.set([])
+
+    def set(self, talismans: List[dict]):
+        talismans = [Talisman(**t).model_dump(mode="json") for t in talismans]
+        body = json.dumps(talismans, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.talismans = talismans
+        self.by_id: Dict[str, dict] = {t['id']: t for t in talismans}
+        self.by_condition: Dict[str, List[dict]] = {}
+        for talisman in talismans:
+            self.by_condition.setdefault(talisman['condition'], []).append(talisman)
+        self.body = body
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+
+    async def refresh(self):
+        self.set(await db.talismans.find({}, {"_id": 0}).to_list(None))
+        logger.info("Tılsım kataloğu yüklendi: %d tılsım, sürüm %s", len(self.talismans), self.version)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+talisman_catalog = TalismanCatalog()
+
+class LeaderboardIndex:
+    # (-xp, id) anahtarlı sıralı liste: sayfa ve sıra sorguları O(log n).
+    # Başlangıçta users'tan kurulur, XP değiştiren her yer update() çağırmalı.
+    def __init__(self):
+        self._ranked = SortedList()
+        self._users: Dict[str, Tuple[int, str, int]] = {}
+
+    async def load(self):
+        ranked = []
+        users = {}
+        cursor = db.users.find({}, {"_id": 0, "id": 1, "username": 1, "xp": 1, "level": 1})
+        async for doc in cursor:
+            xp = doc.get('xp', 0)
+            ranked.append((-xp, doc['id']))
+            users[doc['id']] = (xp, doc['username'], doc.get('level', 1))
+        self._ranked = SortedList(ranked)
+        self._users = users
+        logger.info("Liderlik indeksi yüklendi: %d kullanıcı", len(users))
+
+    def __len__(self) -> int:
+        return len(self._ranked)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def update(self, user_id: str, username: str, xp: int, level: int):
+        previous = self._users.get(user_id)
+        if previous is not None:
+            self._ranked.discard((-previous[0], user_id))
+        self._ranked.add((-xp, user_id))
+        self._users[user_id] = (xp, username, level)
+
+    def remove(self, user_id: str):
+        previous = self._users.pop(user_id, None)
+        if previous is not None:
+            self._ranked.discard((-previous[0], user_id))
+
+    def _entry(self, rank: int, user_id: str) -> dict:
+        xp, username, level = self._users[user_id]
+        return {"rank": rank, "username": username, "xp": xp, "level": level}
+
+    def page(self, offset: int, limit: int) -> List[dict]:
+        return [
+            self._entry(offset + i + 1, user_id)
+            for i, (_, user_id) in enumerate(self._ranked.islice(offset, offset + limit))
+        ]
+
+    def rank_of(self, user_id: str) -> Optional[int]:
+        previous = self._users.get(user_id)
+        if previous is None:
+            return None
+        return self._ranked.index((-previous[0], user_id)) + 1
+
+leaderboard_index = LeaderboardIndex()
+
+# Dönemlik XP kovaları: (period, periodKey, userId) başına bir belge, TTL index ile süresi dolar
+XP_BUCKET_RETENTION = {
+    LeaderboardWindow.DAY: timedelta(days=2),
+    LeaderboardWindow.WEEK: timedelta(days=14),
+    LeaderboardWindow.MONTH: timedelta(days=62),
+}
+
+def period_bounds(window: LeaderboardWindow, day: date) -> Tuple[str, date]:
+    # Dönem anahtarı ve dönemin bittiği (hariç) gün
+    if window == LeaderboardWindow.DAY:
+        return day.isoformat(), day + timedelta(days=1)
+    if window == LeaderboardWindow.WEEK:
+        iso_year, iso_week, iso_weekday = day.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}", day + timedelta(days=8 - iso_weekday)
+    if window == LeaderboardWindow.MONTH:
+        next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return f"{day.year}-{day.month:02d}", next_month
+    raise ValueError(f"Dönemsiz pencere: {window}")
+
+def applied_events_push(event_ids: List[str]) -> Dict[str, Any]:
+    return {"appliedEvents": {"$each": event_ids, "$slice": -APPLIED_EVENTS_WINDOW}}
+
+def xp_bucket_operations(user: User, xp_gained: int, day: date, event_ids: List[str]) -> List[UpdateOne]:
+    # appliedEvents koşulu: aynı olayların tekrar işlenmesi kovayı ikinci kez artırmaz
+    operations = []
+    for window, retention in XP_BUCKET_RETENTION.items():
+        period_key, period_end = period_bounds(window, day)
+        expires_at = datetime.combine(period_end, datetime.min.time(), tzinfo=timezone.utc) + retention
+        operations.append(UpdateOne(
+            {"period": window.value, "periodKey": period_key, "userId": user.id, "appliedEvents": {"$nin": event_ids}},
+            {
+                "$inc": {"xp": xp_gained},
+                "$set": {"username": user.username, "level": user.level},
+                "$setOnInsert": {"expiresAt": expires_at},
+                "$push": applied_events_push(event_ids)
+            },
+            upsert=True
+        ))
+    return operations
+
+async def record_xp_buckets(user: User, xp_gained: int, day: date, event_ids: List[str]):
+    try:
+        await db.xp_buckets.bulk_write(xp_bucket_operations(user, xp_gained, day, event_ids), ordered=False)
+    except BulkWriteError as e:
+        # Koşul tutmayınca upsert unique index'e çarpar: kova bu olayları zaten saymış
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+
+# Günlük istatistik özetleri: (userId, day) başına bir belge, her tamamlanmada $inc ile güncellenir
+class CompletionRecord(NamedTuple):
+    spellId: str
+    repeatType: str
+    xp: int
+
+def daily_rollup_increments(completions: List[CompletionRecord]) -> Dict[str, int]:
+    increments: Dict[str, int] = {"completions": len(completions), "xp": 0}
+    for completion in completions:
+        increments["xp"] += completion.xp
+        repeat_key = f"byRepeatType.{completion.repeatType}"
+        increments[repeat_key] = increments.get(repeat_key, 0) + 1
+        spell_key = f"bySpell.{completion.spellId}"
+        increments[spell_key] = increments.get(spell_key, 0) + 1
+    return increments
+
+async def record_daily_rollup(user_id: str, day: date, completions: List[CompletionRecord], event_ids: List[str]):
+    try:
+        await db.user_daily_stats.update_one(
+            {"userId": user_id, "day": day.isoformat(), "appliedEvents": {"$nin": event_ids}},
+            {"$inc": daily_rollup_increments(completions), "$push": applied_events_push(event_ids)},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Özet bu olayları zaten saymış (yarıda kalan işlemin tekrarı)
+        pass
+
+def statistics_period(day: date, granularity: StatisticsGranularity) -> Tuple[str, date]:
+    if granularity == StatisticsGranularity.WEEK:
+        return period_bounds(LeaderboardWindow.WEEK, day)[0], day - timedelta(days=day.weekday())
+    return day.isoformat(), day
+
+def summarize_statistics(
+    rollups: List[dict],
+    spells: List[dict],
+    start: date,
+    end: date,
+    granularity: StatisticsGranularity
+) -> UserStatistics:
+    # Yanıt boyutu geçmişin uzunluğuna değil, aralığa ve büyü sayısına bağlıdır
+    periods: Dict[str, dict] = {}
+    day = start
+    while day <= end:
+        key, period_start = statistics_period(day, granularity)
+        periods.setdefault(key, {"period": key, "start": period_start, "completions": 0, "xp": 0})
+        day += timedelta(days=1)
+    
+    repeat_types = {repeat_type.value: 0 for repeat_type in RepeatType}
+    spell_completions: Dict[str, int] = {}
+    for rollup in rollups:
+        period = periods[statistics_period(date.fromisoformat(rollup['day']), granularity)[0]]
+        period['completions'] += rollup.get('completions', 0)
+        period['xp'] += rollup.get('xp', 0)
+        for repeat_type, count in rollup.get('byRepeatType', {}).items():
+            repeat_types[repeat_type] = repeat_types.get(repeat_type, 0) + count
+        for spell_id, count in rollup.get('bySpell', {}).items():
+            spell_completions[spell_id] = spell_completions.get(spell_id, 0) + count
+    
+    spell_rates = []
+    for spell in spells:
+        created_at = spell.get('createdAt')
+        if isinstance(created_at, str):
+            # migrate-dates çalışmadan önceki metin tarih
+            try:
+                created_at = parse_stored_datetime(created_at)
+            except ValueError:
+                created_at = None
+        active_start = max(start, created_at.date()) if created_at else start
+        if active_start > end:
+            expected = 0
+        elif spell['repeatType'] == RepeatType.WEEKLY.value:
+            expected = (end - (active_start - timedelta(days=active_start.weekday()))).days // 7 + 1
+        else:
+            expected = (end - active_start).days + 1
+        completions = spell_completions.get(spell['id'], 0)
+        spell_rates.append(SpellCompletionRate(
+            spellId=spell['id'],
+            title=spell['title'],
+            repeatType=spell['repeatType'],
+            completions=completions,
+            expected=expected,
+            rate=round(completions / expected, 3) if expected else 0.0
+        ))
+    
+    return UserStatistics(
+        start=start,
+        end=end,
+        granularity=granularity,
+        totalCompletions=sum(p['completions'] for p in periods.values()),
+        totalXp=sum(p['xp'] for p in periods.values()),
+        periods=[StatisticsPeriod(**p) for p in periods.values()],
+        repeatTypes=repeat_types,
+        spells=spell_rates
+    )
+
+def talisman_unlock_operations(user_id: str, conditions: List[TalismanCondition]) -> List[UpdateOne]:
+    # Upsert; (userId, talismanId) unique index'i tekrarları engeller, açılmış tılsım değişmez
+    operations = []
+    for talisman in (t for c in conditions for t in talisman_catalog.by_condition.get(c.value, [])):
+        user_talisman = UserTalisman(userId=user_id, talismanId=talisman['id'])
+        operations.append(UpdateOne(
+            {"userId": user_id, "talismanId": talisman['id']},
+            {"$setOnInsert": {
+                "id": user_talisman.id,
+                "unlockedAt": user_talisman.unlockedAt
+            }},
+            upsert=True
+        ))
+    return operations
+
+async def write_talisman_unlocks(operations: List[UpdateOne]) -> int:
+    if not operations:
+        return 0
+    try:
+        result = await db.user_talismans.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Eşzamanlı upsert'ler duplicate key hatası verebilir: tılsım zaten açılmış demektir
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+        return e.details.get('nUpserted', 0)
+    return result.upserted_count
+
+async def check_and_unlock_talismans(user: User, before: Dict[str, int]) -> int:
+    # Sadece bu tamamlanmayla yeni geçilen eşiklerin tılsımları açılır; eşik kontrolü öncesi
+    # açılmamış kalanlar için backfill-talismans komutu
+    conditions = talisman_rules.newly_met(before, talisman_metrics(user))
+    if not conditions:
+        return 0
+    return await write_talisman_unlocks(talisman_unlock_operations(user.id, conditions))
 
 # Auth endpoints
 @api_router.post("/auth/register")
@@ -234,7 +1539,7 @@ async def register(user_data: UserRegister):
         raise HTTPException(status_code=400, detail="Bu email zaten kayıtlı")
     
     # Kullanıcı oluştur
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hashing_pool.run(hash_password, user_data.password)
     user = User(
         username=user_data.username,
         email=user_data.email
@@ -242,9 +1547,15 @@ async def register(user_data: UserRegister):
     
     user_dict = user.model_dump()
     user_dict['password'] = hashed_password
-    user_dict['createdAt'] = user_dict['createdAt'].isoformat()
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Aynı email ile eşzamanlı kayıt: kontrolü ikisi de geçer, unique index biri reddeder
+        raise HTTPException(status_code=400, detail="Bu email zaten kayıtlı")
+    user_cache.put(user)
+    leaderboard_index.update(user.id, user.username, user.xp, user.level)
+    await invalidation_bus.publish("users", user.id, user.model_dump())
     
     # Token oluştur
     access_token = create_access_token(
@@ -260,14 +1571,24 @@ async def register(user_data: UserRegister):
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     # Kullanıcıyı bul
-    user_doc = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+    user_doc = await db.users.find_one({"email": credentials.email}, {"_id": 0, "appliedEvents": 0})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Email veya şifre hatalı")
     
     # Şifre kontrolü
-    if not verify_password(credentials.password, user_doc['password']):
+    verified, new_hash = await hashing_pool.run(
+        verify_and_update_password, credentials.password, user_doc['password']
+    )
+    if not verified:
         raise HTTPException(status_code=401, detail="Email veya şifre hatalı")
     
+    # bcrypt maliyeti değiştiyse hash'i yenile
+    if new_hash:
+        await db.users.update_one(
+            {"id": user_doc['id'], "password": user_doc['password']},
+            {"$set": {"password": new_hash}}
+        )
+    
     # Token oluştur
     access_token = create_access_token(
         data={"sub": user_doc['id']},
@@ -276,14 +1597,38 @@ async def login(credentials: UserLogin):
     
     # Password'u çıkar
     user_doc.pop('password')
-    if isinstance(user_doc.get('createdAt'), str):
-        user_doc['createdAt'] = datetime.fromisoformat(user_doc['createdAt'])
     
     return {
         "token": access_token,
         "user": user_doc
     }
 
+@api_router.post("/auth/logout")
+async def logout(token: VerifiedToken = Depends(get_current_token)):
+    await token_revocations.revoke_token(token)
+    token_cache.evict(token.digest)
+    return {"message": "Çıkış yapıldı"}
+
+@api_router.post("/auth/change-password")
+async def change_password(passwords: PasswordChange, current_user: User = Depends(get_current_user)):
+    user_doc = await db.users.find_one({"id": current_user.id}, {"_id": 0, "password": 1})
+    if user_doc is None:
+        raise HTTPException(status_code=401, detail="Kullanıcı bulunamadı")
+    
+    if not await hashing_pool.run(verify_password, passwords.currentPassword, user_doc['password']):
+        raise HTTPException(status_code=400, detail="Mevcut şifre hatalı")
+    
+    hashed_password = await hashing_pool.run(hash_password, passwords.newPassword)
+    await db.users.update_one({"id": current_user.id}, {"$set": {"password": hashed_password}})
+    
+    # Bu ana kadar üretilmiş tüm token'ları iptal et ve yenisini ver
+    await token_revocations.revoke_user(current_user.id, time.time())
+    access_token = create_access_token(
+        data={"sub": current_user.id},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"token": access_token}
+
 # User endpoints
 @api_router.get("/user/profile", response_model=User)
 async def get_profile(current_user: User = Depends(get_current_user)):
@@ -291,8 +1636,14 @@ async def get_profile(current_user: User = Depends(get_current_user)):
 
 @api_router.get("/user/stats", response_model=UserStats)
 async def get_user_stats(current_user: User = Depends(get_current_user)):
+    return await load_user_stats(current_user)
+
+async def load_user_stats(current_user: User) -> UserStats:
     # Kullanıcının tılsım sayısını al
-    talisman_count = await db.user_talismans.count_documents({"userId": current_user.id})
+    route = READ_ROUTES["talismans"]
+    talisman_count = await route.collection("user_talismans").count_documents(
+        {"userId": current_user.id}, maxTimeMS=route.max_time_ms
+    )
     
     return UserStats(
         totalSpellsCompleted=current_user.totalSpellsCompleted,
@@ -303,32 +1654,385 @@ async def get_user_stats(current_user: User = Depends(get_current_user)):
         unlockedTalismans=talisman_count
     )
 
+@api_router.get("/user/statistics", response_model=UserStatistics)
+async def get_user_statistics(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    granularity: StatisticsGranularity = StatisticsGranularity.DAY,
+    current_user: User = Depends(get_current_user)
+):
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=STATISTICS_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Başlangıç tarihi bitişten sonra olamaz")
+    if (end - start).days + 1 > STATISTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"En fazla {STATISTICS_MAX_DAYS} günlük aralık seçilebilir")
+    return await load_user_statistics(current_user, start, end, granularity)
+
+async def load_user_statistics(
+    current_user: User,
+    start: date,
+    end: date,
+    granularity: StatisticsGranularity
+) -> UserStatistics:
+    # Günlük özetler ve büyü listesi (completedDates olmadan) paralel okunur. createdAt'i hâlâ metin
+    # olan büyüler (migrate-dates öncesi) BSON tür sıralaması yüzünden $lt ile eşleşmez; ayrıca seçilir.
+    route = READ_ROUTES["statistics"]
+    created_before = datetime.combine(end + timedelta(days=1), datetime.min.time(), timezone.utc)
+    rollups, spells = await asyncio.gather(
+        route.collection("user_daily_stats").find(
+            {"userId": current_user.id, "day": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+            {"_id": 0, "userId": 0, "appliedEvents": 0}
+        ).max_time_ms(route.max_time_ms).to_list(None),
+        route.collection("spells").find(
+            {"userId": current_user.id, "$or": [
+                {"createdAt": {"$lt": created_before}}, {"createdAt": {"$type": "string"}}
+            ]},
+            {"_id": 0, "id": 1, "title": 1, "repeatType": 1, "createdAt": 1}
+        ).max_time_ms(route.max_time_ms).to_list(None),
+    )
+    return summarize_statistics(rollups, spells, start, end, granularity)
+
 # Spell endpoints
 @api_router.post("/spells", response_model=Spell)
 async def create_spell(spell_data: SpellCreate, current_user: User = Depends(get_current_user)):
+    spell, spell_dict = new_spell_document(spell_data, current_user.id)
+    await db.spells.insert_one(spell_dict)
+    return spell
+
+def new_spell_document(spell_data: SpellCreate, user_id: str) -> Tuple[Spell, dict]:
     spell = Spell(
         title=spell_data.title,
         description=spell_data.description,
         repeatType=spell_data.repeatType,
         xpReward=spell_data.xpReward,
-        userId=current_user.id
+        userId=user_id
     )
     
     spell_dict = spell.model_dump()
-    spell_dict['createdAt'] = spell_dict['createdAt'].isoformat()
+    # Tamamlanma geçmişi dizi yerine bitmap olarak tutulur
+    spell_dict.pop('completedDates')
+    spell_dict.pop('completionCount')
+    spell_dict['completionBits'] = {}
+    return spell, spell_dict
+
+# Özet modunda completedDates yerine sadece bugünün durumu döner
+SPELL_SUMMARY_FIELDS = ["id", "title", "description", "repeatType", "isCompleted", "xpReward", "userId", "createdAt"]
+
+class SpellView(NamedTuple):
+    projection: Dict[str, Any]
+    render: Any
+
+def spell_view(fields: Optional[str]) -> SpellView:
+    # İstenen alanlara göre Mongo projeksiyonu ve belge başına dönüşüm
+    if fields is None:
+        return SpellView(SPELL_RESPONSE_PROJECTION, spell_response)
+    if fields == "summary":
+        today = datetime.now(timezone.utc).date()
+        word, _ = completion_slot(today)
+        projection: Dict[str, Any] = {name: 1 for name in SPELL_SUMMARY_FIELDS}
+        projection[f"completionBits.{word}"] = 1
+        projection["completedDates"] = {"$elemMatch": {"$eq": today.isoformat()}}
+        
+        def render(spell: dict) -> dict:
+            spell['completedToday'] = today in CompletionBitmap.from_doc(spell)
+            spell.pop('completionBits', None)
+            spell.pop('completedDates', None)
+            return spell
+        
+        return SpellView({**projection, "_id": 0}, render)
     
-    await db.spells.insert_one(spell_dict)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(Spell.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Bilinmeyen alan: {', '.join(sorted(unknown))}")
+    # id ve createdAt sayfa cursor'ı için her zaman gelir
+    projection = {name: 1 for name in requested | {"id", "createdAt"}}
+    projection.pop("completionCount", None)
+    if "completedDates" in requested or "completionCount" in requested:
+        projection["completionBits"] = 1
+        projection["completedDates"] = 1
+    
+    def render(spell: dict) -> dict:
+        if "completionCount" in requested:
+            spell['completionCount'] = len(CompletionBitmap.from_doc(spell))
+        if "completedDates" in requested:
+            return expand_completions(spell)
+        spell.pop('completionBits', None)
+        spell.pop('completedDates', None)
+        return spell
+    
+    return SpellView({**projection, "_id": 0}, render)
+
+def json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} JSON'a çevrilemez")
+
+def json_bytes(value: Any) -> bytes:
+    return orjson.dumps(value, default=json_default)
+
+class TrustedJSONResponse(Response):
+    # Zaten API şeklinde olan belgeler için: response_model ile ikinci kez doğrulanmaz,
+    # jsonable_encoder + json.dumps yerine orjson ile doğrudan bayta yazılır
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
+
+# Spell yanıtına giren alanlar; projeksiyon model dışı alanları (lastCompletionBatch vb.) dışarıda bırakır
+SPELL_RESPONSE_PROJECTION = {
+    "_id": 0, **{name: 1 for name in Spell.model_fields if name != "completionCount"}, "completionBits": 1
+}
+
+def spell_response(spell: dict) -> dict:
+    # Varsayılan liste tarihleri açmaz (büyü başına yüzlerce ISO metni): sadece completionCount döner,
+    # tarihler fields=...,completedDates ile istenir. createdAt BSON date olarak orjson ile yazılır.
+    count_completions(spell)
+    spell.setdefault('isCompleted', False)
+    return spell
+
+def spell_export(spell: dict) -> dict:
+    # Dışa aktarma tam geçmişi taşır: tarihler her zaman açılır
+    expand_completions(spell)
+    spell.setdefault('completedDates', [])
+    spell.setdefault('isCompleted', False)
     return spell
 
+async def ndjson_stream(cursor, render=None):
+    # Belgeler Motor cursor'ından geldikçe yazılır; bellekte hiçbir zaman tüm liste tutulmaz
+    async for doc in cursor:
+        if render is not None:
+            doc = render(doc)
+        yield json_bytes(doc) + b"\n"
+
+# Büyü listeleri oluşturulma sırasıyla; (createdAt, id) keyset'i (userId, createdAt, id) index'ini kullanır
+SPELL_ORDER = [("createdAt", ASCENDING), ("id", ASCENDING)]
+
+def spell_cursor(spell: dict) -> str:
+    # migrate-dates öncesi createdAt metin olabilir; türü cursor'da taşınır
+    created_at = spell.get('createdAt')
+    if isinstance(created_at, datetime):
+        value = ["d", created_at.isoformat(), spell['id']]
+    else:
+        value = ["s", created_at, spell['id']]
+    return base64.urlsafe_b64encode(json_bytes(value)).decode().rstrip("=")
+
+def spell_after_filter(cursor: str) -> Dict[str, Any]:
+    try:
+        kind, created_at, spell_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if kind == "d":
+            created_at = datetime.fromisoformat(created_at)
+        elif kind != "s":
+            raise ValueError(kind)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Geçersiz cursor")
+    after: List[Dict[str, Any]] = [
+        {"createdAt": {"$gt": created_at}},
+        {"createdAt": created_at, "id": {"$gt": spell_id}},
+    ]
+    if kind == "s":
+        # BSON sıralamasında metinler tarihlerden önce gelir; $gt türler arası eşleşmez
+        after.append({"createdAt": {"$type": "date"}})
+    return {"$or": after}
+
+async def spell_page(query: Dict[str, Any], view: SpellView, limit: int) -> Tuple[List[dict], Optional[str]]:
+    # Bir fazla okunur: devamı varsa son büyünün cursor'ı döner
+    route = READ_ROUTES["spells"]
+    spells = await route.collection("spells").find(query, view.projection).sort(SPELL_ORDER) \
+        .limit(limit + 1).max_time_ms(route.max_time_ms).to_list(limit + 1)
+    next_cursor = None
+    if len(spells) > limit:
+        spells = spells[:limit]
+        next_cursor = spell_cursor(spells[-1])
+    return [view.render(spell) for spell in spells], next_cursor
+
 @api_router.get("/spells", response_model=List[Spell])
-async def get_spells(current_user: User = Depends(get_current_user)):
-    spells = await db.spells.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
+async def get_spells(
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    output: SpellListFormat = Query(SpellListFormat.JSON, alias="format"),
+    current_user: User = Depends(get_current_user)
+):
+    # Keyset sayfalama: after, önceki yanıtın X-Next-Cursor başlığıdır
+    query: Dict[str, Any] = {"userId": current_user.id}
+    if after is not None:
+        query.update(spell_after_filter(after))
+    view = spell_view(fields)
     
-    for spell in spells:
-        if isinstance(spell.get('createdAt'), str):
-            spell['createdAt'] = datetime.fromisoformat(spell['createdAt'])
+    # Parametresiz çağrı eski yanıt şeklini korur; sınırı aşan listede devamı X-Next-Cursor ile bildirilir
+    if after is None and limit is None and fields is None and output == SpellListFormat.JSON:
+        spells, next_cursor = await spell_page(query, view, SPELL_LEGACY_LIST_LIMIT)
+        return TrustedJSONResponse(spells, headers={"X-Next-Cursor": next_cursor} if next_cursor else {})
     
-    return spells
+    if output == SpellListFormat.NDJSON:
+        route = READ_ROUTES["spells"]
+        cursor = route.collection("spells").find(query, view.projection).sort(SPELL_ORDER).max_time_ms(route.max_time_ms)
+        if limit is not None:
+            cursor = cursor.limit(max(limit, 1))
+        return StreamingResponse(
+            ndjson_stream(cursor.batch_size(SPELL_STREAM_BATCH_SIZE), view.render),
+            media_type="application/x-ndjson"
+        )
+    
+    limit = min(max(limit or SPELL_PAGE_DEFAULT_LIMIT, 1), SPELL_PAGE_MAX_LIMIT)
+    spells, next_cursor = await spell_page(query, view, limit)
+    return TrustedJSONResponse(spells, headers={"X-Next-Cursor": next_cursor} if next_cursor else {})
+
+# Toplu içe/dışa aktarma
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+SPELL_EXPORT_CSV_FIELDS = ["id", "title", "description", "repeatType", "xpReward", "createdAt", "completedDates"]
+
+async def request_lines(request: Request) -> AsyncIterator[str]:
+    # Gövdeyi parça parça okur; bellekte en fazla bir yarım satır tutulur
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    try:
+        async for chunk in request.stream():
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line.rstrip("\r")
+            if len(pending) > SPELL_IMPORT_MAX_LINE_BYTES:
+                raise HTTPException(status_code=413, detail="Satır çok uzun")
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Dosya UTF-8 olmalı")
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+async def import_rows(request: Request, is_csv: bool) -> AsyncIterator[Tuple[int, Any]]:
+    # (satır no, ham kayıt) üretir; ayrıştırılamayan satırlar için kayıt yerine hata mesajı döner.
+    # CSV'de tırnaklı alan satır sonu içerebilir: kayıt, tırnaklar dengelenene kadar biriktirilir.
+    header: Optional[List[str]] = None
+    line_number = 0
+    record: List[str] = []
+    record_line = 0
+    record_quotes = 0
+    record_bytes = 0
+    async for line in request_lines(request):
+        line_number += 1
+        if not record and not line.strip():
+            continue
+        if not is_csv:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, f"Geçersiz JSON: {e.msg}"
+                continue
+            yield line_number, row if isinstance(row, dict) else "Her satır bir JSON nesnesi olmalı"
+            continue
+        if not record:
+            record_line = line_number
+        record.append(line + "\n")
+        record_quotes += line.count('"')
+        record_bytes += len(line) + 1
+        if record_quotes % 2:
+            if record_bytes > SPELL_IMPORT_MAX_LINE_BYTES:
+                raise HTTPException(status_code=413, detail="Satır çok uzun")
+            continue
+        values = next(csv.reader(record))
+        record, record_quotes, record_bytes = [], 0, 0
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        # Boş hücreler varsayılan değerleri kullanır
+        yield record_line, {name: value for name, value in zip(header, values) if value != ""}
+    if record:
+        yield record_line, "Kapanmamış tırnak"
+
+@api_router.post("/spells/import", response_model=SpellImportResult)
+async def import_spells(request: Request, current_user: User = Depends(get_current_user)):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == "text/csv":
+        is_csv = True
+    elif content_type in NDJSON_CONTENT_TYPES:
+        is_csv = False
+    else:
+        raise HTTPException(status_code=415, detail="text/csv veya application/x-ndjson gönderin")
+    
+    inserted = 0
+    failed = 0
+    errors: List[SpellImportError] = []
+    chunk: List[dict] = []
+    chunk_lines: List[int] = []
+    
+    def record_error(line: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < SPELL_IMPORT_MAX_ERRORS:
+            errors.append(SpellImportError(line=line, error=message))
+    
+    async def flush():
+        nonlocal inserted, chunk, chunk_lines
+        try:
+            result = await db.spells.insert_many(chunk, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get('nInserted', 0)
+            for error in e.details.get('writeErrors', []):
+                record_error(chunk_lines[error['index']], error.get('errmsg', 'Yazma hatası'))
+        chunk, chunk_lines = [], []
+    
+    async for line_number, row in import_rows(request, is_csv):
+        if isinstance(row, str):
+            record_error(line_number, row)
+            continue
+        try:
+            spell_data = SpellCreate(**row)
+        except ValidationError as e:
+            first = e.errors()[0]
+            record_error(line_number, f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}")
+            continue
+        chunk.append(new_spell_document(spell_data, current_user.id)[1])
+        chunk_lines.append(line_number)
+        if len(chunk) >= SPELL_IMPORT_CHUNK_SIZE:
+            await flush()
+    if chunk:
+        await flush()
+    
+    return SpellImportResult(
+        inserted=inserted,
+        failed=failed,
+        errors=errors,
+        errorsTruncated=failed > len(errors)
+    )
+
+async def csv_stream(cursor, render) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=SPELL_EXPORT_CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    async for doc in cursor:
+        doc = render(doc)
+        doc['completedDates'] = ";".join(doc.get('completedDates', []))
+        if isinstance(doc.get('createdAt'), datetime):
+            doc['createdAt'] = doc['createdAt'].isoformat()
+        writer.writerow(doc)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+@api_router.get("/spells/export")
+async def export_spells(
+    output: SpellExportFormat = Query(SpellExportFormat.NDJSON, alias="format"),
+    current_user: User = Depends(get_current_user)
+):
+    # Motor cursor'ından akış halinde; tüm liste hiçbir zaman belleğe alınmaz
+    view = SpellView(SPELL_RESPONSE_PROJECTION, spell_export)
+    route = READ_ROUTES["export"]
+    cursor = route.collection("spells").find({"userId": current_user.id}, view.projection) \
+        .sort(SPELL_ORDER).max_time_ms(route.max_time_ms)
+    cursor = cursor.batch_size(SPELL_STREAM_BATCH_SIZE)
+    if output == SpellExportFormat.CSV:
+        body, media_type = csv_stream(cursor, view.render), "text/csv; charset=utf-8"
+    else:
+        body, media_type = ndjson_stream(cursor, view.render), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="spells.{output.value}"'}
+    )
 
 @api_router.put("/spells/{spell_id}", response_model=Spell)
 async def update_spell(spell_id: str, spell_data: SpellUpdate, current_user: User = Depends(get_current_user)):
@@ -343,10 +2047,8 @@ async def update_spell(spell_id: str, spell_data: SpellUpdate, current_user: Use
         await db.spells.update_one({"id": spell_id}, {"$set": update_data})
         spell.update(update_data)
     
-    if isinstance(spell.get('createdAt'), str):
-        spell['createdAt'] = datetime.fromisoformat(spell['createdAt'])
-    
-    return Spell(**spell)
+    spell['completionCount'] = len(CompletionBitmap.from_doc(spell))
+    return Spell(**expand_completions(spell))
 
 @api_router.delete("/spells/{spell_id}")
 async def delete_spell(spell_id: str, current_user: User = Depends(get_current_user)):
@@ -355,97 +2057,704 @@ async def delete_spell(spell_id: str, current_user: User = Depends(get_current_u
         raise HTTPException(status_code=404, detail="Büyü bulunamadı")
     return {"message": "Büyü silindi"}
 
-@api_router.post("/spells/{spell_id}/complete")
-async def complete_spell(spell_id: str, current_user: User = Depends(get_current_user)):
-    # Büyüyü bul
-    spell = await db.spells.find_one({"id": spell_id, "userId": current_user.id}, {"_id": 0})
-    if not spell:
-        raise HTTPException(status_code=404, detail="Büyü bulunamadı")
+# Tamamlanma olay günlüğü
+# Her tamamlanma completion_events'e değişmez bir olay olarak yazılır; (spellId, day) unique index'i
+# aynı günün ikinci tamamlanmasını engeller. Olaylar kullanıcı sayaçlarına, spell bitmap'lerine ve
+# özetlere toplu olarak işlenir: sync modda istek içinde, deferred modda CompletionCompactor ile.
+# Kullanıcı, XP kovası ve günlük özet belgelerindeki appliedEvents pencereleri sayesinde yarıda kalan
+# bir işleme güvenle tekrarlanır; her yan etki olayın kendisine bağlıdır.
+def new_claim() -> Tuple[str, datetime]:
+    return str(uuid.uuid4()), datetime.now(timezone.utc) + timedelta(seconds=COMPLETION_CLAIM_SECONDS)
+
+def completion_event(
+    user_id: str, completion: CompletionRecord, day: date, claim: Optional[Tuple[str, datetime]] = None
+) -> dict:
+    event = {
+        "userId": user_id,
+        "spellId": completion.spellId,
+        "day": day.isoformat(),
+        "xp": completion.xp,
+        "repeatType": completion.repeatType,
+        "createdAt": datetime.now(timezone.utc),
+        "pending": True,
+    }
+    if claim is not None:
+        # İsteğin kendisi işleyecek; kompaktör talep süresi dolana kadar dokunmaz
+        event["claimId"], event["claimedUntil"] = claim
+    return event
+
+def event_record(event: dict) -> CompletionRecord:
+    return CompletionRecord(event['spellId'], event['repeatType'], event['xp'])
+
+async def record_completion_events(events: List[dict]) -> Tuple[List[dict], List[dict]]:
+    # (yazılanlar, aynı gün zaten tamamlanmış olanlar)
+    if not events:
+        return [], []
+    try:
+        await db.completion_events.insert_many(events, ordered=False)
+        return events, []
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != 11000 for error in write_errors):
+            raise
+        duplicates = {error['index'] for error in write_errors}
+        return (
+            [event for index, event in enumerate(events) if index not in duplicates],
+            [events[index] for index in sorted(duplicates)],
+        )
+
+async def claim_completion_events(limit: int) -> List[dict]:
+    # Bekleyen olayları bu çağrıya ayırır; talebi süresi dolmuş olaylar (çökmüş işlem) yeniden alınır
+    now = datetime.now(timezone.utc)
+    claim_id, claimed_until = new_claim()
+    unclaimed = {"pending": True, "$or": [{"claimedUntil": {"$exists": False}}, {"claimedUntil": {"$lt": now}}]}
+    candidates = await db.completion_events.find(unclaimed, {"_id": 1}).sort("createdAt", ASCENDING).limit(limit).to_list(limit)
+    if not candidates:
+        return []
+    ids = [candidate['_id'] for candidate in candidates]
+    await db.completion_events.update_many(
+        {"_id": {"$in": ids}, **unclaimed},
+        {"$set": {"claimId": claim_id, "claimedUntil": claimed_until}}
+    )
+    return await db.completion_events.find({"_id": {"$in": ids}, "claimId": claim_id}).to_list(None)
+
+def spell_bitmap_operations(events: List[dict]) -> List[UpdateOne]:
+    return [
+        UpdateOne({"id": event['spellId'], "userId": event['userId']}, mark_completed_update(date.fromisoformat(event['day'])))
+        for event in events
+    ]
+
+async def record_completion_side_effects(user: User, day: date, events: List[dict]):
+    # Bir (kullanıcı, gün) grubunun XP kovaları ve günlük özeti; olay kimlikleriyle korunur
+    event_ids = [str(event['_id']) for event in events]
+    completions = [event_record(event) for event in events]
+    await asyncio.gather(
+        record_xp_buckets(user, sum(completion.xp for completion in completions), day, event_ids),
+        record_daily_rollup(user.id, day, completions, event_ids),
+    )
+
+async def mark_events_applied(events: List[dict]):
+    await db.completion_events.update_many(
+        {"_id": {"$in": [event['_id'] for event in events]}},
+        {"$set": {"appliedAt": datetime.now(timezone.utc)}, "$unset": {"pending": "", "claimId": "", "claimedUntil": ""}}
+    )
+
+async def apply_completion_events(events: List[dict]) -> Dict[str, User]:
+    # Olayları (kullanıcı, gün) gruplarıyla, gün sırasına göre işler; güncel kullanıcıları döner
+    if not events:
+        return {}
+    groups: Dict[Tuple[str, str], List[dict]] = {}
+    for event in sorted(events, key=lambda event: (event['userId'], event['day'])):
+        groups.setdefault((event['userId'], event['day']), []).append(event)
+    user_ids = list(dict.fromkeys(event['userId'] for event in events))
+    before = {
+        doc['id']: doc
+        for doc in await db.users.find(
+            {"id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "appliedEvents": 1, "xp": 1, "level": 1, "totalSpellsCompleted": 1, "currentStreak": 1}
+        ).to_list(None)
+    }
     
-    today = datetime.now(timezone.utc).date().isoformat()
+    # Daha önce işlenmiş olaylar (appliedEvents'te olanlar) sayaçlara tekrar eklenmez
+    operations = []
+    retried_users = set()
+    for (user_id, day), group in groups.items():
+        if user_id not in before:
+            continue
+        applied = set(before[user_id].get('appliedEvents') or [])
+        fresh = [event for event in group if str(event['_id']) not in applied]
+        if len(fresh) < len(group):
+            retried_users.add(user_id)
+        if not fresh:
+            continue
+        event_ids = [str(event['_id']) for event in fresh]
+        completed_day = date.fromisoformat(day)
+        operations.append(UpdateOne(
+            {"id": user_id, "appliedEvents": {"$nin": event_ids}},
+            completion_update_pipeline(
+                sum(event['xp'] for event in fresh), len(fresh),
+                day, (completed_day - timedelta(days=1)).isoformat(), event_ids
+            )
+        ))
+    if operations:
+        # Sıralı: aynı kullanıcının günleri sırayla işlenmeli (streak)
+        await db.users.bulk_write(operations, ordered=True)
     
-    # Bugün zaten tamamlanmış mı kontrol et
-    if today in spell.get('completedDates', []):
-        raise HTTPException(status_code=400, detail="Bu büyü bugün zaten tamamlanmış")
+    # Bitmap güncellemesi idempotent, tüm olaylar için yapılır
+    await db.spells.bulk_write(spell_bitmap_operations(events), ordered=False)
     
-    # Büyüyü tamamla
-    completed_dates = spell.get('completedDates', [])
-    completed_dates.append(today)
+    updated: Dict[str, User] = {}
+    async for doc in db.users.find({"id": {"$in": user_ids}}, USER_PROJECTION):
+        user = User(**doc)
+        user_cache.put(user)
+        leaderboard_index.update(user.id, user.username, user.xp, user.level)
+        updated[user.id] = user
+    await invalidation_bus.publish_many([("users", user.id, user.model_dump()) for user in updated.values()])
     
-    await db.spells.update_one(
-        {"id": spell_id},
-        {"$set": {
-            "completedDates": completed_dates
-        }}
-    )
+    # Yan etkiler olay başına idempotent: sayaçlar önceki denemede güncellenmiş olsa da tekrar denenir
+    side_effects = []
+    for (user_id, day), group in groups.items():
+        if user_id in updated:
+            side_effects.append(record_completion_side_effects(updated[user_id], date.fromisoformat(day), group))
+    for user_id in updated:
+        # Sayaçları önceki bir denemede artmış kullanıcıda eşikler sıfırdan kontrol edilir (açma idempotent)
+        previous = {} if user_id in retried_users else before[user_id]
+        side_effects.append(check_and_unlock_talismans(updated[user_id], {
+            "totalSpellsCompleted": previous.get('totalSpellsCompleted', 0),
+            "level": previous.get('level', 1),
+            "currentStreak": previous.get('currentStreak', 0),
+        }))
+    await asyncio.gather(*side_effects)
     
-    # Kullanıcıyı güncelle - XP ekle ve seviye kontrolü
-    new_xp = current_user.xp + spell['xpReward']
-    new_level = calculate_level(new_xp)
+    await mark_events_applied(events)
+    return updated
+
+async def apply_claimed_completions(
+    user: User, events: List[dict], day: date, background_tasks: BackgroundTasks
+) -> User:
+    # sync mod: olaylar bu isteğe ait (talepli), kompaktör dokunmaz. Yanıt yolunda sadece sayaçlar
+    # (tek find_one_and_update, güncel belge döner) ve onunla paralel bitmap yazılır; kalan işler yanıttan sonra.
+    event_ids = [str(event['_id']) for event in events]
+    xp_gained = sum(event['xp'] for event in events)
+    user_doc, _ = await asyncio.gather(
+        db.users.find_one_and_update(
+            {"id": user.id, "appliedEvents": {"$nin": event_ids}},
+            completion_update_pipeline(
+                xp_gained, len(events), day.isoformat(), (day - timedelta(days=1)).isoformat(), event_ids
+            ),
+            projection=USER_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        ),
+        db.spells.bulk_write(spell_bitmap_operations(events), ordered=False),
+    )
+    if user_doc is None:
+        # Olaylar sayaçlara başka yoldan işlenmiş: genel (tekrar güvenli) yola düş
+        return (await apply_completion_events(events)).get(user.id, user)
     
-    # Streak hesaplama
-    yesterday = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
-    if current_user.lastCompletionDate == yesterday:
-        new_streak = current_user.currentStreak + 1
-    elif current_user.lastCompletionDate == today:
-        new_streak = current_user.currentStreak
-    else:
-        new_streak = 1
+    updated_user = User(**user_doc)
+    user_cache.put(updated_user)
+    leaderboard_index.update(updated_user.id, updated_user.username, updated_user.xp, updated_user.level)
+    background_tasks.add_task(finish_claimed_completions, updated_user, events, day, xp_gained)
+    return updated_user
+
+async def finish_claimed_completions(user: User, events: List[dict], day: date, xp_gained: int):
+    # Yan etkiler olay başına idempotent; burada hata olursa talep süresi dolunca kompaktör tamamlar.
+    # Önceki metrikler güncel belgeden türetilir; streak için alt sınır yeterli (açma idempotent)
+    before = {
+        "totalSpellsCompleted": user.totalSpellsCompleted - len(events),
+        "level": calculate_level(user.xp - xp_gained),
+        "currentStreak": user.currentStreak - 1,
+    }
+    try:
+        await asyncio.gather(
+            invalidation_bus.publish_many([("users", user.id, user.model_dump())]),
+            record_completion_side_effects(user, day, events),
+            check_and_unlock_talismans(user, before),
+        )
+        # Yan etkiler yazılmadan olay işlenmiş sayılmaz
+        await mark_events_applied(events)
+    except Exception:
+        logger.exception("Tamamlanma yan etkileri yazılamadı, kompaktöre bırakıldı")
+
+async def finish_completions(user: User, events: List[dict], day: date, background_tasks: BackgroundTasks) -> User:
+    if COMPLETION_WRITE_MODE != "deferred":
+        return await apply_claimed_completions(user, events, day, background_tasks)
     
-    new_max_streak = max(current_user.maxStreak, new_streak)
+    # Sayaçları kompaktör güncelleyecek; yanıt için beklenen değerler hesaplanır
+    xp_gained = sum(event['xp'] for event in events)
+    return user.model_copy(update={
+        "xp": user.xp + xp_gained,
+        "level": calculate_level(user.xp + xp_gained),
+        "totalSpellsCompleted": user.totalSpellsCompleted + len(events),
+        "currentStreak": next_streak(user, day.isoformat(), (day - timedelta(days=1)).isoformat()),
+    })
+
+class CompletionCompactor:
+    # Bekleyen olayları partiler halinde işler; deferred modda asıl yazıcı, sync modda yarıda
+    # kalmış istekleri tamamlar. Talep mekanizması sayesinde birden çok worker'da güvenle çalışır.
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        events = await claim_completion_events(self.batch_size)
+        if events:
+            await apply_completion_events(events)
+        return len(events)
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Tamamlanma olayları işlenemedi")
+                processed = 0
+            # Parti doluysa beklemeden devam et
+            if processed < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+completion_compactor = CompletionCompactor(COMPLETION_COMPACT_INTERVAL, COMPLETION_COMPACT_BATCH_SIZE)
+
+# Dönem sıfırlama
+# isCompleted, lastCompletedDay içinde bulunduğumuz dönemin (gün / ISO hafta) başından eskiyse
+# false yapılır. (repeatType, isCompleted, lastCompletedDay) index'i sayesinde her çalışma sadece
+# sıfırlanacak büyüleri okur. Filtre kendini tanımladığı için yarıda kalan çalışma bir sonrakinde tamamlanır.
+def reset_period_start(repeat_type: RepeatType, today: date) -> date:
+    if repeat_type == RepeatType.WEEKLY:
+        return today - timedelta(days=today.weekday())
+    return today
+
+def reset_due_filter(repeat_type: RepeatType, today: date) -> Dict[str, Any]:
+    return {
+        "repeatType": repeat_type.value,
+        "isCompleted": True,
+        # lastCompletedDay'i olmayan eski belgeler de dahil
+        "lastCompletedDay": {"$not": {"$gte": reset_period_start(repeat_type, today).isoformat()}},
+    }
+
+class MongoLease:
+    # scheduler_leases'te süreli kilit: aynı anda tek replika sahip olur, sahibi öldüyse süre dolunca devralınır
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            lease = await db.scheduler_leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expiresAt": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expiresAt": now + timedelta(seconds=self.ttl_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Kilit başka bir replikada ve süresi dolmamış
+            return False
+        return lease is not None and lease['owner'] == self.owner
+
+    async def release(self):
+        await db.scheduler_leases.delete_one({"_id": self.name, "owner": self.owner})
+
+async def reset_spells(today: date, batch_size: int, lease: Optional[MongoLease] = None) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for repeat_type in RepeatType:
+        due = reset_due_filter(repeat_type, today)
+        counts[repeat_type.value] = 0
+        while True:
+            ids = [doc['_id'] for doc in await db.spells.find(due, {"_id": 1}).limit(batch_size).to_list(batch_size)]
+            if not ids:
+                break
+            result = await db.spells.update_many({"_id": {"$in": ids}, **due}, {"$set": {"isCompleted": False}})
+            counts[repeat_type.value] += result.modified_count
+            if lease is not None and not await lease.acquire():
+                # Kilit kaybedildi; kalan iş kilidi alan replikada devam eder
+                raise RuntimeError("Sıfırlama kilidi kaybedildi")
+    return counts
+
+class SpellResetScheduler:
+    def __init__(self, batch_size: int, check_interval: float, lease_seconds: float):
+        self.batch_size = batch_size
+        self.check_interval = check_interval
+        self.lease = MongoLease("spell-reset", lease_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def seconds_until_next_run(self) -> float:
+        # Bir sonraki UTC gün sınırı (haftalık sınır da bir gün sınırıdır) ya da kontrol aralığı
+        now = datetime.now(timezone.utc)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        return max(min((midnight - now).total_seconds() + 1, self.check_interval), 1)
+
+    async def run_once(self) -> Optional[Dict[str, int]]:
+        if not await self.lease.acquire():
+            return None
+        started = datetime.now(timezone.utc)
+        run_id = (await db.scheduler_runs.insert_one({
+            "job": "spell-reset",
+            "owner": self.lease.owner,
+            "startedAt": started,
+            "status": "running",
+        })).inserted_id
+        run_status, counts = "failed", {}
+        try:
+            counts = await reset_spells(started.date(), self.batch_size, self.lease)
+            run_status = "done"
+            return counts
+        finally:
+            finished = datetime.now(timezone.utc)
+            await db.scheduler_runs.update_one({"_id": run_id}, {"$set": {
+                "status": run_status,
+                "finishedAt": finished,
+                "durationMs": int((finished - started).total_seconds() * 1000),
+                "resetCounts": counts,
+            }})
+            await self.lease.release()
+
+    async def _run(self):
+        while True:
+            try:
+                counts = await self.run_once()
+                if counts and any(counts.values()):
+                    logger.info("Büyü sıfırlama: %s", counts)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Büyü sıfırlama başarısız")
+            await asyncio.sleep(self.seconds_until_next_run())
+
+spell_reset_scheduler = SpellResetScheduler(SPELL_RESET_BATCH_SIZE, SPELL_RESET_CHECK_INTERVAL, SPELL_RESET_LEASE_SECONDS)
+
+# Süreçler arası önbellek geçersizleştirme
+# Her uvicorn worker'ı kendi user_cache / token iptal listesi / liderlik indeksi / tılsım kataloğu
+# kopyasını tutar. Replika setinde bu koleksiyonlara yapılan yazılar change stream ile izlenir;
+# tek mongod'da (change stream yok) yazan süreç capped "invalidations" koleksiyonuna mesaj bırakır
+# ve diğerleri onu tailable cursor ile takip eder. İşleyiciler idempotent: aynı mesajın iki kez
+# uygulanması veya yazan sürecin kendi değişikliğini görmesi zararsızdır.
+INVALIDATED_COLLECTIONS = ("users", "talismans", "revoked_tokens")
+
+class InvalidationBus:
+    def __init__(self, mode: str, capped_bytes: int, retry_interval: float):
+        self.requested_mode = mode
+        self.capped_bytes = capped_bytes
+        self.retry_interval = retry_interval
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.mode: Optional[str] = None
+        self._resume_token: Optional[dict] = None
+        self._start_at = None
+        self._last_id = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def detect_mode(self) -> str:
+        if self.requested_mode in ("changestream", "poll", "off"):
+            return self.requested_mode
+        hello = await client.admin.command("hello")
+        if hello.get("setName") or hello.get("msg") == "isdbgrid":
+            return "changestream"
+        return "poll"
+
+    async def prepare(self):
+        # Önbellekler yüklenmeden önce çağrılır: yükleme sırasında gelen değişiklikler start()'tan sonra işlenir
+        self.mode = await self.detect_mode()
+        if self.mode == "changestream":
+            self._start_at = (await client.admin.command("hello")).get("operationTime")
+        elif self.mode == "poll":
+            await self.ensure_collection()
+            latest = await db.invalidations.find_one({}, {"_id": 1}, sort=[("$natural", DESCENDING)])
+            if latest is None:
+                # Boş capped koleksiyonda tailable cursor hemen kapanır; başlangıç işareti bırakılır
+                latest = {"_id": (await db.invalidations.insert_one({"origin": self.origin, "collection": None})).inserted_id}
+            self._last_id = latest['_id']
+        logger.info("Önbellek geçersizleştirme modu: %s", self.mode)
+
+    async def ensure_collection(self):
+        try:
+            await db.create_collection("invalidations", capped=True, size=self.capped_bytes)
+        except CollectionInvalid:
+            pass
+        except OperationFailure as exc:
+            # Başka bir worker aynı anda oluşturdu (NamespaceExists)
+            if exc.code != 48:
+                raise
+
+    def start(self):
+        if self.mode == "changestream":
+            self._task = asyncio.create_task(self._watch())
+        elif self.mode == "poll":
+            self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def publish(self, collection: str, key: str, doc: Optional[dict] = None):
+        await self.publish_many([(collection, key, doc)])
+
+    async def publish_many(self, messages: List[Tuple[str, str, Optional[dict]]]):
+        # Change stream modunda yazının kendisi mesajdır; sadece poll modunda ayrıca kayıt bırakılır
+        if self.mode != "poll" or not messages:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            await db.invalidations.insert_many([
+                {"origin": self.origin, "collection": collection, "key": key, "doc": doc, "createdAt": now}
+                for collection, key, doc in messages
+            ])
+        except Exception:
+            # Yazı zaten yapıldı; diğer süreçler en geç önbellek TTL'i dolunca düzelir
+            logger.exception("Geçersizleştirme mesajı yazılamadı")
+
+    async def apply(self, collection: str, key: str, doc: Optional[dict]):
+        cache_invalidations.inc((collection,))
+        if collection == "users":
+            if key == "*":
+                user_cache.clear()
+                await leaderboard_index.load()
+            elif doc is None:
+                user_cache.evict(key)
+                leaderboard_index.remove(key)
+            else:
+                user = User(**doc)
+                user_cache.refresh(user)
+                leaderboard_index.update(user.id, user.username, user.xp, user.level)
+        elif collection == "talismans":
+            await talisman_catalog.refresh()
+        elif collection == "revoked_tokens" and doc is not None:
+            token_revocations.apply(doc)
+
+    async def resync(self):
+        # Mesaj kaçırıldıysa (capped koleksiyon taştı, change stream geçmişi silindi) her şey yeniden yüklenir
+        logger.warning("Geçersizleştirme akışı koptu, önbellekler yeniden yükleniyor")
+        user_cache.clear()
+        await asyncio.gather(leaderboard_index.load(), talisman_catalog.refresh(), token_revocations.load())
+
+    async def _watch(self):
+        pipeline = [
+            {"$match": {
+                "ns.coll": {"$in": list(INVALIDATED_COLLECTIONS)},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+            }},
+            {"$project": {"fullDocument.password": 0, "fullDocument.appliedEvents": 0}},
+        ]
+        needs_resync = False
+        while True:
+            try:
+                async with db.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                    start_at_operation_time=None if self._resume_token else self._start_at,
+                ) as stream:
+                    if needs_resync:
+                        # Akış açıldıktan sonra yüklenir: yükleme sırasındaki değişiklikler akıştan gelir.
+                        # Mongo hâlâ erişilemezse hata aşağıda yakalanır ve bir sonraki turda tekrar denenir.
+                        await self.resync()
+                        needs_resync = False
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        collection = change['ns']['coll']
+                        doc = change.get('fullDocument')
+                        if collection == "users":
+                            # Silinen kullanıcının id'si documentKey'de yok; tam yenileme gerekir
+                            await self.apply(collection, doc['id'] if doc else "*", doc)
+                        elif collection == "revoked_tokens":
+                            await self.apply(collection, change['documentKey']['_id'], doc)
+                        else:
+                            await self.apply(collection, "*", None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # pymongo geçici hatalarda kendisi devam eder; buraya gelindiyse konum kaybolmuştur
+                logger.exception("Change stream kapandı")
+                self._resume_token = None
+                self._start_at = None
+                needs_resync = True
+                await asyncio.sleep(self.retry_interval)
+
+    async def _tail(self):
+        # Capped koleksiyon doğal sırası ekleme sırasıdır. Farklı süreçlerin aynı saniyede ürettiği
+        # ObjectId'ler sıralı olmadığından _id ile ($gt) devam edilmez: akış baştan açılır ve son
+        # görülen mesaja kadar olanlar atlanır. Taşma ile silinmişse aradakiler kaçmış olabilir.
+        while True:
+            try:
+                cursor = db.invalidations.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+                skipping = self._last_id is not None
+                skipped_id = None
+                while cursor.alive:
+                    async for message in cursor:
+                        if skipping:
+                            skipping = message['_id'] != self._last_id
+                            skipped_id = message['_id']
+                            continue
+                        self._last_id = message['_id']
+                        if message['origin'] != self.origin and message.get('collection'):
+                            await self.apply(message['collection'], message['key'], message.get('doc'))
+                    if skipping:
+                        # Mevcut mesajların sonuna gelindi ama son görülen bulunamadı
+                        await self.resync()
+                        skipping = False
+                        if skipped_id is not None:
+                            self._last_id = skipped_id
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Geçersizleştirme kuyruğu okunamadı")
+            await asyncio.sleep(self.retry_interval)
+
+invalidation_bus = InvalidationBus(INVALIDATION_MODE, INVALIDATION_CAPPED_BYTES, INVALIDATION_RETRY_INTERVAL)
+
+def completion_summary(updated_user: User, xp_gained: int) -> Dict[str, Any]:
+    return {
+        "xpGained": xp_gained,
+        "newXp": updated_user.xp,
+        "newLevel": updated_user.level,
+        "leveledUp": updated_user.level > calculate_level(updated_user.xp - xp_gained),
+        "newStreak": updated_user.currentStreak
+    }
+
+def completion_claim() -> Optional[Tuple[str, datetime]]:
+    return new_claim() if COMPLETION_WRITE_MODE != "deferred" else None
+
+@api_router.post("/spells/{spell_id}/complete")
+async def complete_spell(
+    spell_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    today_date = datetime.now(timezone.utc).date()
     
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$set": {
-            "xp": new_xp,
-            "level": new_level,
-            "currentStreak": new_streak,
-            "maxStreak": new_max_streak,
-            "totalSpellsCompleted": current_user.totalSpellsCompleted + 1,
-            "lastCompletionDate": today
-        }}
+    # Bitmap'te bugün işaretli olmayan büyüyü oku; asıl tekrar kontrolü olayın unique index'i
+    spell = await db.spells.find_one(
+        {"id": spell_id, "userId": current_user.id, **not_completed_on_filter(today_date)},
+        {"_id": 0, "xpReward": 1, "repeatType": 1},
     )
+    if not spell:
+        # Sadece hata yolunda: büyü yok mu, yoksa bugün zaten mi tamamlandı?
+        if await db.spells.count_documents({"id": spell_id, "userId": current_user.id}, limit=1) == 0:
+            raise HTTPException(status_code=404, detail="Büyü bulunamadı")
+        raise HTTPException(status_code=400, detail="Bu büyü bugün zaten tamamlanmış")
     
-    # Güncel kullanıcıyı al
-    updated_user_doc = await db.users.find_one({"id": current_user.id}, {"_id": 0, "password": 0})
-    if isinstance(updated_user_doc.get('createdAt'), str):
-        updated_user_doc['createdAt'] = datetime.fromisoformat(updated_user_doc['createdAt'])
-    updated_user = User(**updated_user_doc)
+    completion = CompletionRecord(spell_id, spell['repeatType'], spell['xpReward'])
+    recorded, _ = await record_completion_events(
+        [completion_event(current_user.id, completion, today_date, completion_claim())]
+    )
+    if not recorded:
+        raise HTTPException(status_code=400, detail="Bu büyü bugün zaten tamamlanmış")
     
-    # Tılsımları kontrol et
-    await check_and_unlock_talismans(updated_user)
+    updated_user = await finish_completions(current_user, recorded, today_date, background_tasks)
     
     return {
         "message": "Büyü tamamlandı!",
-        "xpGained": spell['xpReward'],
-        "newXp": new_xp,
-        "newLevel": new_level,
-        "leveledUp": new_level > current_user.level,
-        "newStreak": new_streak
+        **completion_summary(updated_user, spell['xpReward'])
+    }
+
+@api_router.post("/spells/complete-batch")
+async def complete_spells_batch(
+    batch: SpellBatchComplete,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    today_date = datetime.now(timezone.utc).date()
+    today = today_date.isoformat()
+    word, _ = completion_slot(today_date)
+    spell_ids = list(dict.fromkeys(batch.spellIds))
+    
+    # Tüm büyüleri tek $in sorgusuyla doğrula; sadece bugünün bitini ve dizideki bugünü getir
+    spells = await db.spells.find(
+        {"id": {"$in": spell_ids}, "userId": current_user.id},
+        {
+            "_id": 0, "id": 1, "xpReward": 1, "repeatType": 1,
+            f"completionBits.{word}": 1,
+            "completedDates": {"$elemMatch": {"$eq": today}}
+        }
+    ).to_list(None)
+    found = {spell['id']: spell for spell in spells}
+    
+    errors: Dict[str, str] = {}
+    pending = []
+    for spell_id in spell_ids:
+        spell = found.get(spell_id)
+        if spell is None:
+            errors[spell_id] = "Büyü bulunamadı"
+        elif today_date in CompletionBitmap.from_doc(spell):
+            errors[spell_id] = "Bu büyü bugün zaten tamamlanmış"
+        else:
+            pending.append(spell)
+    
+    # Tek insert_many; eşzamanlı bir istek önce tamamladıysa (spellId, day) çakışması döner
+    claim = completion_claim()
+    recorded, duplicates = await record_completion_events([
+        completion_event(
+            current_user.id, CompletionRecord(spell['id'], spell['repeatType'], spell['xpReward']), today_date, claim
+        )
+        for spell in pending
+    ])
+    for event in duplicates:
+        errors[event['spellId']] = "Bu büyü bugün zaten tamamlanmış"
+    
+    xp_by_spell = {event['spellId']: event['xp'] for event in recorded}
+    results = [
+        SpellCompletionResult(
+            spellId=spell_id,
+            completed=spell_id in xp_by_spell,
+            xpGained=xp_by_spell.get(spell_id, 0),
+            error=errors.get(spell_id)
+        )
+        for spell_id in spell_ids
+    ]
+    
+    updated_user = current_user
+    if recorded:
+        updated_user = await finish_completions(current_user, recorded, today_date, background_tasks)
+    
+    return {
+        "results": [r.model_dump() for r in results],
+        "completed": len(recorded),
+        **completion_summary(updated_user, sum(xp_by_spell.values()))
     }
 
 # Talisman endpoints
 @api_router.get("/talismans", response_model=List[Talisman])
-async def get_all_talismans():
-    talismans = await db.talismans.find({}, {"_id": 0}).to_list(1000)
-    return talismans
+async def get_all_talismans(request: Request):
+    # Bellekteki katalogdan, önceden serileştirilmiş haliyle döner
+    headers = {
+        "ETag": talisman_catalog.etag,
+        "Cache-Control": f"public, max-age={TALISMAN_CACHE_MAX_AGE}"
+    }
+    if talisman_catalog.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=talisman_catalog.body, media_type="application/json", headers=headers)
 
 @api_router.get("/user/talismans")
 async def get_user_talismans(current_user: User = Depends(get_current_user)):
+    return await load_user_talismans(current_user)
+
+async def load_user_talismans(current_user: User) -> List[dict]:
     # Kullanıcının tılsımlarını al
-    user_talismans = await db.user_talismans.find({"userId": current_user.id}, {"_id": 0}).to_list(1000)
+    route = READ_ROUTES["talismans"]
+    user_talismans = await route.collection("user_talismans").find(
+        {"userId": current_user.id}, {"_id": 0}
+    ).max_time_ms(route.max_time_ms).to_list(1000)
     
-    # Tılsım detaylarını al
-    talisman_ids = [ut['talismanId'] for ut in user_talismans]
-    talismans = await db.talismans.find({"id": {"$in": talisman_ids}}, {"_id": 0}).to_list(1000)
-    
-    # Birleştir
+    # Tılsım detaylarıyla birleştir (katalog bellekte)
     result = []
     for ut in user_talismans:
-        talisman = next((t for t in talismans if t['id'] == ut['talismanId']), None)
+        talisman = talisman_catalog.by_id.get(ut['talismanId'])
         if talisman:
-            if isinstance(ut.get('unlockedAt'), str):
-                ut['unlockedAt'] = datetime.fromisoformat(ut['unlockedAt'])
             result.append({
                 **talisman,
                 "unlockedAt": ut['unlockedAt']
@@ -455,9 +2764,100 @@ async def get_user_talismans(current_user: User = Depends(get_current_user)):
 
 # Leaderboard endpoint
 @api_router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(limit: int = 10):
-    users = await db.users.find({}, {"_id": 0, "username": 1, "xp": 1, "level": 1}).sort("xp", -1).limit(limit).to_list(limit)
-    return users
+async def get_leaderboard(
+    offset: int = 0,
+    limit: int = 10,
+    window: LeaderboardWindow = LeaderboardWindow.ALL
+):
+    # Tüm zamanlar bellekteki sıralı indeksten; limit üst sınırla kırpılır
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), LEADERBOARD_MAX_LIMIT)
+    if window == LeaderboardWindow.ALL:
+        return TrustedJSONResponse(leaderboard_index.page(offset, limit))
+    
+    # Dönemlik sıralama XP kovalarından, (period, periodKey, xp) index'i üzerinden
+    period_key, _ = period_bounds(window, datetime.now(timezone.utc).date())
+    route = READ_ROUTES["leaderboard"]
+    buckets = await route.collection("xp_buckets").find(
+        {"period": window.value, "periodKey": period_key},
+        {"_id": 0, "username": 1, "xp": 1, "level": 1}
+    ).sort([("xp", DESCENDING), ("userId", ASCENDING)]).skip(offset).limit(limit) \
+        .max_time_ms(route.max_time_ms).to_list(limit)
+    return TrustedJSONResponse([{"rank": offset + i + 1, **bucket} for i, bucket in enumerate(buckets)])
+
+@api_router.get("/leaderboard/me", response_model=LeaderboardPosition)
+async def get_my_leaderboard_position(radius: int = 2, current_user: User = Depends(get_current_user)):
+    # Başka bir süreçte kaydolmuş kullanıcı indekste yoksa ekle
+    if current_user.id not in leaderboard_index:
+        leaderboard_index.update(current_user.id, current_user.username, current_user.xp, current_user.level)
+    
+    rank = leaderboard_index.rank_of(current_user.id)
+    radius = min(max(radius, 0), LEADERBOARD_MAX_LIMIT // 2)
+    start = max(rank - 1 - radius, 0)
+    neighbours = leaderboard_index.page(start, rank - start + radius)
+    
+    return LeaderboardPosition(
+        rank=rank,
+        total=len(leaderboard_index),
+        entry=neighbours[rank - 1 - start],
+        neighbours=neighbours
+    )
+
+# Sayfa bazlı birleşik uç nokta: kimlik bir kez doğrulanır, bağımsız sorgular paralel çalışır
+class DashboardSection(str, Enum):
+    SPELLS = "spells"
+    STATS = "stats"
+    LEADERBOARD = "leaderboard"
+    TALISMANS = "talismans"
+    USER_TALISMANS = "userTalismans"
+    STATISTICS = "statistics"
+
+DEFAULT_DASHBOARD_SECTIONS = "spells,stats,leaderboard"
+
+async def load_spell_summaries(current_user: User) -> Tuple[List[dict], Optional[str]]:
+    # Dashboard için completedDates yerine completedToday taşıyan özet liste ve devam cursor'ı
+    return await spell_page({"userId": current_user.id}, spell_view("summary"), SPELL_PAGE_MAX_LIMIT)
+
+@api_router.get("/dashboard")
+async def get_dashboard(
+    response: Response,
+    sections: str = DEFAULT_DASHBOARD_SECTIONS,
+    leaderboardLimit: int = 5,
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        requested = list(dict.fromkeys(DashboardSection(name.strip()) for name in sections.split(",") if name.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Bilinmeyen bölüm")
+    
+    async def leaderboard():
+        return leaderboard_index.page(0, min(max(leaderboardLimit, 1), LEADERBOARD_MAX_LIMIT))
+    
+    async def talismans():
+        return talisman_catalog.talismans
+    
+    async def spells():
+        # Liste sınırı aşarsa devamı /api/spells?fields=summary&after=<X-Next-Cursor> ile alınır
+        summaries, next_cursor = await load_spell_summaries(current_user)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return summaries
+    
+    async def statistics():
+        end = datetime.now(timezone.utc).date()
+        start = end - timedelta(days=STATISTICS_DEFAULT_DAYS - 1)
+        return await load_user_statistics(current_user, start, end, StatisticsGranularity.DAY)
+    
+    loaders = {
+        DashboardSection.SPELLS: spells,
+        DashboardSection.STATS: lambda: load_user_stats(current_user),
+        DashboardSection.LEADERBOARD: leaderboard,
+        DashboardSection.TALISMANS: talismans,
+        DashboardSection.USER_TALISMANS: lambda: load_user_talismans(current_user),
+        DashboardSection.STATISTICS: statistics,
+    }
+    results = await asyncio.gather(*(loaders[section]() for section in requested))
+    return {section.value: result for section, result in zip(requested, results)}
 
 # Başlangıç verilerini oluştur
 @api_router.post("/init-data")
@@ -524,10 +2924,286 @@ async def initialize_data():
             }
         ]
         await db.talismans.insert_many(talismans_data)
+        await talisman_catalog.refresh()
+        await invalidation_bus.publish("talismans", "*")
         return {"message": "Tılsımlar oluşturuldu"}
     
     return {"message": "Veriler zaten mevcut"}
 
+# Metrik uç noktası ve middleware
+class MetricsMiddleware:
+    # Saf ASGI: BaseHTTPMiddleware'in ek task/kuyruk maliyeti yok. Rota etiketi eşleşen
+    # şablondan (/api/spells/{spell_id}) alınır; eşleşmeyen yollar tek etikette toplanır.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            elapsed = time.perf_counter() - started
+            http_request_duration.observe((scope["method"], route_path), elapsed)
+            http_requests_total.inc((scope["method"], route_path, status_code))
+
+# İstek profilleme
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}:{frame.f_lineno}".replace(";", ",")
+
+def awaited_stack(coro) -> List[str]:
+    # Askıdaki task'ın mantıksal yığını: coroutine -> cr_await zinciri. Zincirin ucundaki
+    # Future (ör. Motor'un thread havuzundaki Mongo çağrısı) "[await ...]" olarak görünür.
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            stack.append(f"[await {type(coro).__name__}]")
+            break
+        stack.append(frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+class RequestProfiler:
+    # İsteği yürüten task'ı ayrı bir thread'den örnekler. Task çalışıyorsa event loop thread'inin
+    # gerçek yığını, askıdaysa await zinciri alınır; böylece Mongo'da beklenen süre de görünür.
+    def __init__(self, task: asyncio.Task, interval: float):
+        self.task = task
+        self.interval = interval
+        self.loop_thread_id = threading.get_ident()
+        self.samples: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _sample(self) -> List[str]:
+        root = self.task.get_coro()
+        if not getattr(root, "cr_running", False):
+            return awaited_stack(root)
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = []
+        while frame is not None and frame is not root.cr_frame:
+            stack.append(frame_label(frame))
+            frame = frame.f_back
+        if frame is None:
+            # Yığın okunurken task askıya alındı
+            return awaited_stack(root)
+        stack.append(frame_label(frame))
+        stack.reverse()
+        return stack
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.task.done():
+                break
+            try:
+                key = ";".join(self._sample())
+            except (AttributeError, ValueError):
+                # Örnekleme sırasında çerçeve değişmiş olabilir; bu örnek atlanır
+                continue
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+def write_profile(name: str, samples: Dict[str, int]):
+    # speedscope ve flamegraph.pl'nin okuduğu "collapsed stack" biçimi
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(PROFILE_DIR / name, "w") as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+    
+    # En eski dosyalar silinerek dosya sayısı ve toplam boyut sınırda tutulur
+    files = sorted(PROFILE_DIR.glob("*.collapsed"), key=lambda path: path.stat().st_mtime, reverse=True)
+    total = 0
+    for index, path in enumerate(files):
+        total += path.stat().st_size
+        if index >= PROFILE_MAX_FILES or total > PROFILE_MAX_BYTES:
+            path.unlink(missing_ok=True)
+
+def is_admin_token(value: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and value is not None and hmac.compare_digest(value.encode(), ADMIN_TOKEN.encode())
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._counter = itertools.count(1)
+
+    def _should_profile(self, scope) -> bool:
+        if PROFILE_SAMPLE_EVERY > 0 and next(self._counter) % PROFILE_SAMPLE_EVERY == 0:
+            return True
+        headers = dict(scope["headers"])
+        if b"x-profile" not in headers:
+            return False
+        return is_admin_token(headers.get(b"x-admin-token", b"").decode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        profile_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = RequestProfiler(asyncio.current_task(), PROFILE_INTERVAL)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = profiler.stop()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            slug = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            name = f"{profile_id}-{scope['method']}-{slug}-{elapsed_ms}ms.collapsed"
+            if samples:
+                await asyncio.to_thread(write_profile, name, samples)
+
+async def require_admin(request: Request):
+    if not is_admin_token(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Yönetici yetkisi gerekli")
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(limit: int = 50):
+    def scan():
+        if not PROFILE_DIR.exists():
+            return []
+        files = sorted(PROFILE_DIR.glob("*.collapsed"), key=lambda path: path.stat().st_mtime, reverse=True)
+        return [
+            {
+                "name": path.name,
+                "size": path.stat().st_size,
+                "createdAt": datetime.fromtimestamp(path.stat().st_mtime, timezone.utc),
+            }
+            for path in files[:max(limit, 1)]
+        ]
+    return await asyncio.to_thread(scan)
+
+@api_router.get("/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+async def download_profile(name: str):
+    # Yalnızca profil dizinindeki düz dosya adları kabul edilir
+    path = PROFILE_DIR / name
+    if path.name != name or path.suffix != ".collapsed" or not path.is_file():
+        raise HTTPException(status_code=404, detail="Profil bulunamadı")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
+
+@api_router.get("/admin/mongo", dependencies=[Depends(require_admin)])
+async def mongo_diagnostics():
+    topology = client.delegate.topology_description
+    failures: Dict[str, Dict[str, float]] = {}
+    for (address, reason), count in mongo_pool_metrics.checkout_failures.snapshot().items():
+        failures.setdefault(address, {})[reason] = count
+    pools = mongo_pool_metrics.snapshot()
+    addresses = sorted(set(pools["options"]) | set(pools["open"]))
+    return {
+        "pool": {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        },
+        "compressors": {"requested": MONGO_COMPRESSORS, "enabled": mongo_compressors},
+        "readRoutes": {name: route.describe() for name, route in READ_ROUTES.items()},
+        "topology": {
+            "type": topology.topology_type_name,
+            "servers": [
+                {
+                    "address": "%s:%s" % server.address,
+                    "type": server.server_type_name,
+                    "roundTripMs": None if server.round_trip_time is None else round(server.round_trip_time * 1000, 3),
+                }
+                for server in topology.server_descriptions().values()
+            ],
+        },
+        "pools": {
+            address: {
+                "open": pools["open"].get(address, 0),
+                "checkedOut": pools["checked_out"].get(address, 0),
+                "waiting": pools["waiting"].get(address, 0),
+                "cleared": pools["cleared"].get(address, 0),
+                "checkoutFailures": failures.get(address, {}),
+                "options": pools["options"].get(address, {}),
+            }
+            for address in addresses
+        },
+    }
+
+@app.exception_handler(ExecutionTimeout)
+@app.exception_handler(WaitQueueTimeoutError)
+async def mongo_overload_handler(request: Request, exc: Exception):
+    # maxTimeMS bütçesi aşıldı veya havuzda boş bağlantı bulunamadı: istemci yeniden deneyebilir
+    return JSONResponse(status_code=503, content={"detail": "Sunucu meşgul, lütfen tekrar deneyin"}, headers={"Retry-After": "1"})
+
+async def monitor_event_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + EVENT_LOOP_LAG_INTERVAL
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL)
+        event_loop_lag.observe((), max(loop.time() - expected, 0.0))
+
+def cache_metrics() -> Iterator[Tuple[Tuple[str, str], float]]:
+    for name, cache in (("user", user_cache), ("token", token_cache)):
+        stats = cache.stats()
+        for key in ("size", "hits", "misses"):
+            yield (name, key), stats[key]
+
+METRICS: List[Any] = [
+    http_request_duration,
+    http_requests_total,
+    mongo_command_duration,
+    mongo_command_failures,
+    Gauge(
+        "mongodb_pool_connections", "Havuzdaki bağlantılar", ("address", "state"),
+        lambda: [
+            ((address, state), count)
+            for state, counts in mongo_pool_metrics.snapshot().items() if state in ("open", "checked_out", "waiting")
+            for address, count in counts.items()
+        ],
+    ),
+    mongo_pool_metrics.checkout_failures,
+    hash_duration,
+    Gauge(
+        "password_hash_pool_pending", "Hash havuzunda bekleyen/çalışan işler", (),
+        lambda: [((), hashing_pool.pending)],
+    ),
+    event_loop_lag,
+    Gauge("cache_entries", "Önbellek durumu (size/hits/misses)", ("cache", "stat"), cache_metrics),
+    Gauge("leaderboard_index_users", "Bellekteki liderlik indeksindeki kullanıcılar", (), lambda: [((), len(leaderboard_index))]),
+    Gauge(
+        "token_revocations", "Bellekteki iptal kayıtları", ("kind",),
+        lambda: [(("token",), len(token_revocations.tokens)), (("user",), len(token_revocations.user_cutoffs))],
+    ),
+    cache_invalidations,
+]
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    lines = [line for metric in METRICS for line in metric.render()]
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Include the router
 app.include_router(api_router)
 
@@ -537,10 +3213,519 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Profile-Id"],
 )
 
+app.add_middleware(ProfilingMiddleware)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+
+# Yönetim komutları: python server.py <komut>
+async def migrate_completions(batch_size: int) -> int:
+    # completedDates dizilerini completionBits'e taşır. $bit ile birleştirdiği için eşzamanlı
+    # tamamlanmaları ezmez; kesilirse kaldığı yerden devam eder (dizisi kalan belgeler).
+    migrated = 0
+    while True:
+        spells = await db.spells.find(
+            {"completedDates": {"$exists": True}}, {"_id": 1, "completedDates": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not spells:
+            return migrated
+        
+        operations = []
+        for spell in spells:
+            update: Dict[str, Any] = {"$unset": {"completedDates": ""}}
+            words = CompletionBitmap.from_doc({"completedDates": spell['completedDates']}).to_bson()
+            if words:
+                update["$bit"] = {f"completionBits.{index}": {"or": word} for index, word in words.items()}
+            operations.append(UpdateOne({"_id": spell['_id'], "completedDates": spell['completedDates']}, update))
+        result = await db.spells.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+        logger.info("migrate-completions: %d büyü taşındı", migrated)
+
+# ISO metin olarak yazılmış tarih alanları -> BSON date
+DATE_FIELDS: List[Tuple[str, str]] = [
+    ("users", "createdAt"),
+    ("spells", "createdAt"),
+    ("user_talismans", "unlockedAt"),
+]
+
+def parse_stored_datetime(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+async def warn_unmigrated_dates():
+    # Metin tarihler okunabilir ama tarih sorgularında (ör. istatistikler) ayrı yoldan seçilir.
+    # Alanlar index'siz olabilir: büyük koleksiyonda tarama başlangıcı bekletmesin diye süre sınırlı.
+    for collection_name, field in DATE_FIELDS:
+        try:
+            found = await db[collection_name].find_one({field: {"$type": "string"}}, {"_id": 1}, max_time_ms=2000)
+        except ExecutionTimeout:
+            logger.info("%s.%s metin tarih kontrolü zaman aşımına uğradı, atlandı", collection_name, field)
+            continue
+        if found:
+            logger.warning(
+                "%s.%s alanında hâlâ metin tarihler var; `python server.py migrate-dates` çalıştırın",
+                collection_name, field
+            )
+
+async def migrate_dates(batch_size: int) -> int:
+    # Metin tarihleri BSON date'e çevirir. Filtre hâlâ metin olan belgeleri seçtiği için kesilirse
+    # kaldığı yerden devam eder; güncelleme eski değeri de eşlediğinden eşzamanlı yazmaları ezmez.
+    migrated = 0
+    for collection_name, field in DATE_FIELDS:
+        collection = db[collection_name]
+        while True:
+            docs = await collection.find(
+                {field: {"$type": "string"}}, {"_id": 1, field: 1}
+            ).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            
+            operations = []
+            for doc in docs:
+                try:
+                    value = parse_stored_datetime(doc[field])
+                except ValueError:
+                    # Okunamayan değer yerine belgenin ObjectId'sindeki oluşturulma zamanı kullanılır
+                    logger.warning("migrate-dates: %s %s okunamadı: %r", collection_name, doc['_id'], doc[field])
+                    value = doc['_id'].generation_time
+                operations.append(UpdateOne({"_id": doc['_id'], field: doc[field]}, {"$set": {field: value}}))
+            result = await collection.bulk_write(operations, ordered=False)
+            migrated += result.modified_count
+            logger.info("migrate-dates: %s.%s, toplam %d belge", collection_name, field, migrated)
+    return migrated
+
+def rollup_document(user_id: str, day: str, completions: List[CompletionRecord]) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {"userId": user_id, "day": day, "byRepeatType": {}, "bySpell": {}}
+    for key, value in daily_rollup_increments(completions).items():
+        if "." in key:
+            group, name = key.split(".", 1)
+            doc[group][name] = value
+        else:
+            doc[key] = value
+    return doc
+
+async def backfill_events(batch_size: int) -> int:
+    # Olay günlüğünden önceki tamamlanmaları spell bitmap'lerinden olay olarak yazar (mevcut
+    # xpReward ile). İşlenmiş sayılırlar; (spellId, day) çakışmaları atlandığı için tekrar çalıştırılabilir.
+    inserted = 0
+    chunk: List[dict] = []
+    
+    async def flush():
+        nonlocal inserted, chunk
+        recorded, _ = await record_completion_events(chunk)
+        inserted += len(recorded)
+        chunk = []
+        logger.info("backfill-events: %d olay yazıldı", inserted)
+    
+    applied_at = datetime.now(timezone.utc)
+    cursor = db.spells.find(
+        {}, {"_id": 0, "userId": 1, "id": 1, "repeatType": 1, "xpReward": 1, "completionBits": 1, "completedDates": 1}
+    ).batch_size(batch_size)
+    async for spell in cursor:
+        record = CompletionRecord(spell['id'], spell['repeatType'], spell.get('xpReward', 0))
+        for day in CompletionBitmap.from_doc(spell).days():
+            event = completion_event(spell['userId'], record, day)
+            del event['pending']
+            event['createdAt'] = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+            event['appliedAt'] = applied_at
+            chunk.append(event)
+            if len(chunk) >= batch_size:
+                await flush()
+    if chunk:
+        await flush()
+    return inserted
+
+async def replay_user(user_id: str, dry_run: bool = False) -> Dict[str, Any]:
+    # Kullanıcının sayaçlarını ve günlük özetlerini yalnızca olay günlüğünden yeniden hesaplar
+    events = await db.completion_events.find(
+        {"userId": user_id}, {"_id": 1, "spellId": 1, "day": 1, "xp": 1, "repeatType": 1}
+    ).sort([("day", ASCENDING), ("_id", ASCENDING)]).to_list(None)
+    
+    days: Dict[str, List[CompletionRecord]] = {}
+    day_events: Dict[str, List[str]] = {}
+    for event in events:
+        days.setdefault(event['day'], []).append(event_record(event))
+        day_events.setdefault(event['day'], []).append(str(event['_id']))
+    current_streak = max_streak = 0
+    previous: Optional[date] = None
+    for day in map(date.fromisoformat, days):
+        current_streak = current_streak + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        max_streak = max(max_streak, current_streak)
+        previous = day
+    
+    # Son tamamlanma dünden eskiyse seri bozulmuştur
+    if previous is not None and previous < datetime.now(timezone.utc).date() - timedelta(days=1):
+        current_streak = 0
+    
+    xp = sum(event['xp'] for event in events)
+    aggregates = {
+        "xp": xp,
+        "level": calculate_level(xp),
+        "totalSpellsCompleted": len(events),
+        "currentStreak": current_streak,
+        "maxStreak": max_streak,
+        "lastCompletionDate": previous.isoformat() if previous else None,
+        # Kompaktörün elindeki olaylar bu pencere sayesinde tekrar sayılmaz
+        "appliedEvents": [str(event['_id']) for event in events][-APPLIED_EVENTS_WINDOW:],
+    }
+    if dry_run:
+        return aggregates
+    
+    result = await db.users.update_one({"id": user_id}, {"$set": aggregates})
+    if result.matched_count == 0:
+        raise ValueError(f"Kullanıcı bulunamadı: {user_id}")
+    await invalidation_bus.publish("users", user_id, await db.users.find_one({"id": user_id}, USER_PROJECTION))
+    await db.completion_events.update_many(
+        {"userId": user_id, "pending": True},
+        {"$set": {"appliedAt": datetime.now(timezone.utc)}, "$unset": {"pending": "", "claimId": "", "claimedUntil": ""}}
+    )
+    # Günler yerinde değiştirilir, sonra olaysız kalan günler silinir: okuyucu hiçbir an boş özet görmez
+    if days:
+        await db.user_daily_stats.bulk_write([
+            ReplaceOne(
+                {"userId": user_id, "day": day},
+                {
+                    **rollup_document(user_id, day, completions),
+                    "appliedEvents": day_events[day][-APPLIED_EVENTS_WINDOW:],
+                },
+                upsert=True
+            )
+            for day, completions in days.items()
+        ], ordered=False)
+    await db.user_daily_stats.delete_many({"userId": user_id, "day": {"$nin": list(days)}})
+    return aggregates
+
+class StreakRecomputeReport(NamedTuple):
+    users: int
+    spells: int
+    completions: int
+    corrected: int
+    skipped: int
+    seconds: float
+
+# recompute-streaks'in okuduğu ve koşullu güncellemede eşlediği kullanıcı alanları
+STREAK_FIELDS = ("currentStreak", "maxStreak", "totalSpellsCompleted", "lastCompletionDate", "xp", "level")
+
+def streak_corrections(current: dict, computed: Dict[str, Any]) -> Dict[str, Any]:
+    # Bitmap'ler silinmiş büyülerin tamamlanmalarını içermez: birikimli sayaçlar asla düşürülmez.
+    # Son tamamlanma bitmap'lerde yoksa (silinmiş büyü) güncel streak de hesaplanamaz, korunur.
+    expected = dict(computed)
+    for key in ("totalSpellsCompleted", "maxStreak", "xp"):
+        if key in expected:
+            expected[key] = max(expected[key], current.get(key) or 0)
+    if "xp" in expected:
+        expected["level"] = calculate_level(expected["xp"])
+    last_completion = current.get('lastCompletionDate')
+    if last_completion and (expected["lastCompletionDate"] is None or last_completion > expected["lastCompletionDate"]):
+        del expected["currentStreak"], expected["lastCompletionDate"]
+    return {key: value for key, value in expected.items() if current.get(key) != value}
+
+def streak_arrays(users, days, user_count: int, today: int):
+    # Tekil olmayabilen (kullanıcı indeksi, epoch günü) dizilerinden kullanıcı başına güncel streak,
+    # en uzun streak ve son tamamlanma gününü (-1: hiç yok) NumPy dizileri olarak döner.
+    import numpy as np
+    
+    max_streak = np.zeros(user_count, dtype=np.int64)
+    current_streak = np.zeros(user_count, dtype=np.int64)
+    last_day = np.full(user_count, -1, dtype=np.int64)
+    
+    # Streak: tekil (kullanıcı, gün) dizisinde ardışık günlerin run-length'i
+    user_days = np.unique((np.asarray(users, dtype=np.int64) << 32) | np.asarray(days, dtype=np.int64))
+    if len(user_days) == 0:
+        # Grupta hiç tamamlanma yok (ör. yeni veritabanı): herkes sıfırda kalır
+        return current_streak, max_streak, last_day
+    run_users, run_days = (user_days >> 32).astype(np.int32), (user_days & 0xFFFFFFFF).astype(np.int32)
+    breaks = np.ones(len(user_days), dtype=bool)
+    breaks[1:] = (run_users[1:] != run_users[:-1]) | (run_days[1:] != run_days[:-1] + 1)
+    run_ids = np.cumsum(breaks) - 1
+    run_lengths = np.bincount(run_ids)
+    starts = np.flatnonzero(breaks)
+    np.maximum.at(max_streak, run_users[starts], run_lengths)
+    
+    # Kullanıcının son run'ı: son gün dün ya da bugünse güncel streak'tir
+    ends = np.append(starts[1:], len(user_days)) - 1
+    last_runs = ends[np.append(run_users[ends][1:] != run_users[ends][:-1], True)]
+    last_users = run_users[last_runs]
+    last_day[last_users] = run_days[last_runs]
+    current_streak[last_users] = np.where(
+        run_days[last_runs] >= today - 1, run_lengths[run_ids[last_runs]], 0
+    )
+    return current_streak, max_streak, last_day
+
+async def recompute_streaks(
+    batch_size: int, chunk_completions: int, fix_xp: bool = False, dry_run: bool = False
+) -> StreakRecomputeReport:
+    # Tüm kullanıcıların streak/tamamlanma (ve istenirse XP) değerlerini bitmap'lerden NumPy ile yeniden
+    # hesaplar. Büyüler userId sırasıyla akar ve en fazla ~chunk_completions tamamlanmalık kullanıcı
+    # grupları halinde işlenir; bellek toplam veri boyutundan bağımsızdır.
+    import numpy as np  # sadece bu komut için; API süreci NumPy yüklemez
+    
+    started = time.perf_counter()
+    today = (datetime.now(timezone.utc).date() - COMPLETION_EPOCH).days
+    epoch_offset = (COMPLETION_EPOCH - date(1970, 1, 1)).days
+    totals = {"users": 0, "spells": 0, "completions": 0, "corrected": 0, "skipped": 0}
+    
+    user_ids: List[str] = []
+    spell_users: List[int] = []
+    spell_xp: List[int] = []
+    word_spells: List[int] = []
+    word_indexes: List[int] = []
+    word_values: List[int] = []
+    legacy_spells: List[int] = []
+    legacy_dates: List[str] = []
+    pending_completions = 0
+    
+    async def flush():
+        nonlocal user_ids, spell_users, spell_xp, word_spells, word_indexes, word_values
+        nonlocal legacy_spells, legacy_dates, pending_completions
+        if not user_ids:
+            return
+        
+        # Bitmap kelimeleri -> (büyü, gün) çiftleri: her kelime 64 bite açılır
+        words = np.array(word_values, dtype=np.int64).view(np.uint64)
+        bits = np.unpackbits(words.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        rows, offsets = np.nonzero(bits)
+        spells = np.array(word_spells, dtype=np.int64)[rows]
+        days = np.array(word_indexes, dtype=np.int64)[rows] * COMPLETION_WORD_BITS + offsets
+        if legacy_dates:
+            legacy_days = np.array(legacy_dates, dtype="datetime64[D]").astype(np.int64) - epoch_offset
+            spells = np.concatenate([spells, np.array(legacy_spells, dtype=np.int64)])
+            days = np.concatenate([days, legacy_days])
+        
+        # Aynı büyü/gün hem dizide hem bitmap'te olabilir: tekilleştir
+        spell_days = np.unique((spells << 32) | days)
+        spells, days = spell_days >> 32, (spell_days & 0xFFFFFFFF).astype(np.int32)
+        users = np.array(spell_users, dtype=np.int32)[spells]
+        user_count = len(user_ids)
+        completions = np.bincount(users, minlength=user_count)
+        xp = np.bincount(users, weights=np.array(spell_xp, dtype=np.int64)[spells], minlength=user_count)
+        
+        current_streak, max_streak, last_day = streak_arrays(users, days, user_count, today)
+        
+        existing = {
+            doc['id']: doc
+            for doc in await db.users.find(
+                {"id": {"$in": user_ids}}, {"_id": 0, "id": 1, **{field: 1 for field in STREAK_FIELDS}}
+            ).to_list(None)
+        }
+        operations = []
+        for index, user_id in enumerate(user_ids):
+            if user_id not in existing:
+                continue
+            computed: Dict[str, Any] = {
+                "currentStreak": int(current_streak[index]),
+                "maxStreak": int(max_streak[index]),
+                "totalSpellsCompleted": int(completions[index]),
+                "lastCompletionDate": (
+                    (COMPLETION_EPOCH + timedelta(days=int(last_day[index]))).isoformat() if last_day[index] >= 0 else None
+                ),
+            }
+            if fix_xp:
+                computed["xp"] = int(xp[index])
+            changed = streak_corrections(existing[user_id], computed)
+            if changed:
+                # Okunan değerler filtrede: arada gelen bir tamamlanmanın artışları ezilmez, kullanıcı atlanır
+                read = {field: existing[user_id].get(field) for field in STREAK_FIELDS}
+                operations.append(UpdateOne({"id": user_id, **read}, {"$set": changed}))
+        if operations and not dry_run:
+            for offset in range(0, len(operations), batch_size):
+                result = await db.users.bulk_write(operations[offset:offset + batch_size], ordered=False)
+                totals["corrected"] += result.matched_count
+                totals["skipped"] += len(operations[offset:offset + batch_size]) - result.matched_count
+        else:
+            totals["corrected"] += len(operations)
+        
+        totals["users"] += user_count
+        totals["completions"] += len(spell_days)
+        user_ids, spell_users, spell_xp = [], [], []
+        word_spells, word_indexes, word_values = [], [], []
+        legacy_spells, legacy_dates = [], []
+        pending_completions = 0
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "recompute-streaks: %d kullanıcı, %d tamamlanma, %d düzeltme, %d atlandı (%.0f tamamlanma/sn)",
+            totals["users"], totals["completions"], totals["corrected"], totals["skipped"],
+            totals["completions"] / max(elapsed, 1e-9)
+        )
+    
+    cursor = db.spells.find(
+        {}, {"_id": 0, "userId": 1, "xpReward": 1, "completionBits": 1, "completedDates": 1}
+    ).sort([("userId", ASCENDING), ("id", ASCENDING)]).batch_size(batch_size)
+    async for spell in cursor:
+        if not user_ids or user_ids[-1] != spell['userId']:
+            # Grup sınırları kullanıcı sınırında: bir kullanıcının büyüleri hep aynı grupta
+            if pending_completions >= chunk_completions:
+                await flush()
+            user_ids.append(spell['userId'])
+        spell_index = len(spell_users)
+        spell_users.append(len(user_ids) - 1)
+        spell_xp.append(spell.get('xpReward', 0))
+        for word, value in (spell.get('completionBits') or {}).items():
+            if value:
+                word_spells.append(spell_index)
+                word_indexes.append(int(word))
+                word_values.append(int(value))
+                pending_completions += int(value).bit_count()
+        for value in spell.get('completedDates') or []:
+            legacy_spells.append(spell_index)
+            legacy_dates.append(value)
+        pending_completions += len(spell.get('completedDates') or [])
+        totals["spells"] += 1
+    await flush()
+    if totals["corrected"] and not dry_run:
+        # Çalışan API süreçleri tüm kullanıcıları yeniden yükler
+        await invalidation_bus.publish("users", "*")
+    
+    return StreakRecomputeReport(
+        totals["users"], totals["spells"], totals["completions"], totals["corrected"], totals["skipped"],
+        time.perf_counter() - started
+    )
+
+async def backfill_talismans(batch_size: int) -> Tuple[int, int]:
+    # Eşik geçişi kontrolünden önce (ya da eski kodla) açılmamış tılsımları mevcut sayaçlardan açar.
+    # Streak için maxStreak de sayılır: seri o uzunluğa ulaştığında eski kod tılsımı açardı.
+    # Tekrar çalıştırılabilir; açılmış tılsımlar $setOnInsert ile değişmeden kalır.
+    users = unlocked = 0
+    operations: List[UpdateOne] = []
+    cursor = db.users.find(
+        {}, {"_id": 0, "id": 1, "totalSpellsCompleted": 1, "level": 1, "currentStreak": 1, "maxStreak": 1}
+    ).batch_size(batch_size)
+    async for user in cursor:
+        users += 1
+        metrics = {
+            "totalSpellsCompleted": user.get('totalSpellsCompleted', 0),
+            "level": user.get('level', 1),
+            "currentStreak": max(user.get('currentStreak', 0), user.get('maxStreak', 0)),
+        }
+        operations.extend(talisman_unlock_operations(user['id'], talisman_rules.newly_met({}, metrics)))
+        if len(operations) >= batch_size:
+            unlocked += await write_talisman_unlocks(operations)
+            operations = []
+    unlocked += await write_talisman_unlocks(operations)
+    return users, unlocked
+
+async def backfill_rollups(batch_size: int) -> int:
+    # Günlük özetleri spell bitmap'lerinden yeniden kurar (mevcut xpReward ile, yaklaşık XP).
+    # Büyüler userId sırasıyla akar; bellekte aynı anda tek kullanıcının özetleri tutulur.
+    written = 0
+    operations: List[ReplaceOne] = []
+    
+    async def flush_user(user_id: Optional[str], days: Dict[str, List[CompletionRecord]]):
+        nonlocal written, operations
+        for day, completions in days.items():
+            operations.append(ReplaceOne(
+                {"userId": user_id, "day": day}, rollup_document(user_id, day, completions), upsert=True
+            ))
+        if len(operations) >= batch_size:
+            await db.user_daily_stats.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+    
+    current_user_id = None
+    days: Dict[str, List[CompletionRecord]] = {}
+    cursor = db.spells.find(
+        {},
+        {"_id": 0, "userId": 1, "id": 1, "repeatType": 1, "xpReward": 1, "completionBits": 1, "completedDates": 1}
+    ).sort([("userId", ASCENDING), ("id", ASCENDING)]).batch_size(batch_size)
+    async for spell in cursor:
+        if spell['userId'] != current_user_id:
+            await flush_user(current_user_id, days)
+            current_user_id, days = spell['userId'], {}
+        record = CompletionRecord(spell['id'], spell['repeatType'], spell.get('xpReward', 0))
+        for day in CompletionBitmap.from_doc(spell).days():
+            days.setdefault(day.isoformat(), []).append(record)
+    await flush_user(current_user_id, days)
+    if operations:
+        await db.user_daily_stats.bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Akademik Büyücü yönetim komutları")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    migrate = commands.add_parser("migrate-completions", help="completedDates dizilerini bitmap'e taşı")
+    migrate.add_argument("--batch-size", type=int, default=500)
+    
+    dates = commands.add_parser("migrate-dates", help="Metin tarih alanlarını BSON date'e çevir")
+    dates.add_argument("--batch-size", type=int, default=500)
+    
+    events = commands.add_parser("backfill-events", help="Bitmap'lerdeki geçmiş tamamlanmaları olay günlüğüne yaz")
+    events.add_argument("--batch-size", type=int, default=1000)
+    
+    replay = commands.add_parser("replay-user", help="Kullanıcı sayaçlarını olay günlüğünden yeniden hesapla")
+    replay.add_argument("user_id")
+    replay.add_argument("--dry-run", action="store_true", help="Sadece hesapla, yazma")
+    
+    reset = commands.add_parser("reset-spells", help="Dönemi geçmiş isCompleted bayraklarını şimdi sıfırla")
+    reset.add_argument("--batch-size", type=int, default=1000)
+    
+    streaks = commands.add_parser("recompute-streaks", help="Streak ve tamamlanma sayılarını bitmap'lerden yeniden hesapla")
+    streaks.add_argument("--batch-size", type=int, default=1000)
+    streaks.add_argument("--chunk-completions", type=int, default=2_000_000, help="Bellekte tutulacak en fazla tamamlanma")
+    streaks.add_argument("--fix-xp", action="store_true", help="XP ve seviyeyi de mevcut xpReward'lardan düzelt (sadece artırır)")
+    streaks.add_argument("--dry-run", action="store_true", help="Sadece say, yazma")
+    
+    backfill = commands.add_parser("backfill-rollups", help="Günlük istatistik özetlerini bitmap'lerden kur")
+    backfill.add_argument("--batch-size", type=int, default=1000)
+    
+    talismans = commands.add_parser("backfill-talismans", help="Eşikleri zaten geçilmiş ama açılmamış tılsımları aç")
+    talismans.add_argument("--batch-size", type=int, default=1000)
+    
+    args = parser.parse_args(argv)
+    
+    async def run():
+        try:
+            if args.command in ("replay-user", "recompute-streaks"):
+                # Kullanıcı sayaçları değişir; çalışan API süreçlerine haber verilir
+                await invalidation_bus.prepare()
+            if args.command == "migrate-completions":
+                count = await migrate_completions(args.batch_size)
+                logger.info("migrate-completions tamamlandı: %d büyü", count)
+            elif args.command == "migrate-dates":
+                count = await migrate_dates(args.batch_size)
+                logger.info("migrate-dates tamamlandı: %d belge", count)
+            elif args.command == "backfill-events":
+                count = await backfill_events(args.batch_size)
+                logger.info("backfill-events tamamlandı: %d olay", count)
+            elif args.command == "replay-user":
+                aggregates = await replay_user(args.user_id, args.dry_run)
+                aggregates.pop("appliedEvents")
+                logger.info("replay-user %s%s: %s", args.user_id, " (dry-run)" if args.dry_run else "", aggregates)
+            elif args.command == "reset-spells":
+                counts = await reset_spells(datetime.now(timezone.utc).date(), args.batch_size)
+                logger.info("reset-spells tamamlandı: %s", counts)
+            elif args.command == "recompute-streaks":
+                report = await recompute_streaks(args.batch_size, args.chunk_completions, args.fix_xp, args.dry_run)
+                logger.info(
+                    "recompute-streaks tamamlandı%s: %d kullanıcı, %d büyü, %d tamamlanma, %d düzeltme, "
+                    "%d atlandı (eşzamanlı değişti, tekrar çalıştırın), %.2f sn (%.0f tamamlanma/sn)",
+                    " (dry-run)" if args.dry_run else "", report.users, report.spells, report.completions,
+                    report.corrected, report.skipped, report.seconds, report.completions / max(report.seconds, 1e-9)
+                )
+            elif args.command == "backfill-rollups":
+                count = await backfill_rollups(args.batch_size)
+                logger.info("backfill-rollups tamamlandı: %d günlük özet", count)
+            elif args.command == "backfill-talismans":
+                await talisman_catalog.refresh()
+                users, unlocked = await backfill_talismans(args.batch_size)
+                logger.info("backfill-talismans tamamlandı: %d kullanıcı, %d tılsım açıldı", users, unlocked)
+        finally:
+            client.close()
+    
+    asyncio.run(run())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
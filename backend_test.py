@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 
+import argparse
+import asyncio
+import os
+import random
+import subprocess
 import requests
 import sys
 import json
+import time
 from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+DEFAULT_BASE_URL = "https://academic-wizard.preview.emergentagent.com/api"
 
 class AcademicWizardAPITester:
-    def __init__(self, base_url="https://academic-wizard.preview.emergentagent.com/api"):
+    def __init__(self, base_url=DEFAULT_BASE_URL):
         self.base_url = base_url
         self.token = None
         self.user_id = None
@@ -329,8 +340,368 @@ class AcademicWizardAPITester:
             print("⚠️  Some tests failed")
             return False
 
-def main():
-    tester = AcademicWizardAPITester()
+# Load benchmark
+# Weighted mix of what a student does while the app is open
+BENCH_MIX = [
+    ("dashboard", 45),
+    ("leaderboard", 30),
+    ("complete", 20),
+    ("login", 5),
+]
+BENCH_PASSWORD = "BenchPassword123!"
+BENCH_SPELLS_PER_STUDENT = 20
+BENCH_PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+class VirtualStudent:
+    def __init__(self, email):
+        self.email = email
+        self.token = None
+        self.open_spells = []
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+class LoadBenchmark:
+    """Open-loop load generator: requests start on a fixed schedule at the target rate,
+    so a slow server shows up as latency instead of silently lowering the offered load."""
+
+    def __init__(self, base_url, students, rate, duration, warmup, seed=None):
+        self.base_url = base_url.rstrip("/")
+        self.student_count = students
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.random = random.Random(seed)
+        self.students = []
+        self.samples = {}
+        self.errors = {}
+        self.recording = False
+
+    async def setup(self, client):
+        """Create the virtual students and their spells before measuring"""
+        print(f"🔧 Preparing {self.student_count} virtual students...")
+        await client.post(f"{self.base_url}/init-data")
+        run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+        semaphore = asyncio.Semaphore(32)
+
+        async def prepare(index):
+            async with semaphore:
+                student = VirtualStudent(f"bench_{run_id}_{index}@example.com")
+                response = await client.post(f"{self.base_url}/auth/register", json={
+                    "username": f"bench_{run_id}_{index}",
+                    "email": student.email,
+                    "password": BENCH_PASSWORD,
+                })
+                response.raise_for_status()
+                student.token = response.json()["token"]
+                for number in range(BENCH_SPELLS_PER_STUDENT):
+                    response = await client.post(f"{self.base_url}/spells", headers=student.headers, json={
+                        "title": f"Bench spell {number}",
+                        "description": "Load benchmark",
+                        "repeatType": "DAILY" if number % 4 else "WEEKLY",
+                        "xpReward": 10 + number,
+                    })
+                    response.raise_for_status()
+                    student.open_spells.append(response.json()["id"])
+                return student
+
+        self.students = await asyncio.gather(*(prepare(i) for i in range(self.student_count)))
+
+    async def action(self, client, name, student):
+        if name == "complete" and not student.open_spells:
+            # Every spell is done for today; the student just looks at the dashboard
+            name = "dashboard"
+        if name == "dashboard":
+            return name, await client.get(
+                f"{self.base_url}/dashboard?sections=spells,stats,leaderboard&leaderboardLimit=5",
+                headers=student.headers,
+            )
+        if name == "leaderboard":
+            return name, await client.get(f"{self.base_url}/leaderboard?limit=10")
+        if name == "login":
+            response = await client.post(f"{self.base_url}/auth/login", json={
+                "email": student.email,
+                "password": BENCH_PASSWORD,
+            })
+            if response.status_code == 200:
+                student.token = response.json()["token"]
+            return name, response
+        spell_id = student.open_spells.pop()
+        return name, await client.post(f"{self.base_url}/spells/{spell_id}/complete", headers=student.headers)
+
+    async def fire(self, client, name, student, scheduled):
+        try:
+            name, response = await self.action(client, name, student)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        # Latency is measured from the scheduled start, so client-side queueing is included
+        elapsed = time.perf_counter() - scheduled
+        if self.recording:
+            self.samples.setdefault(name, []).append(elapsed)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    async def drive(self):
+        limits = httpx.Limits(max_connections=self.student_count, max_keepalive_connections=self.student_count)
+        async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+            await self.setup(client)
+            names = [name for name, _ in BENCH_MIX]
+            weights = [weight for _, weight in BENCH_MIX]
+            interval = 1 / self.rate
+            pending = set()
+            start = time.perf_counter()
+            measure_start = start + self.warmup
+            end = measure_start + self.duration
+            print(f"🚀 {self.rate:g} req/s for {self.duration:g}s (+{self.warmup:g}s warmup)...")
+            tick = 0
+            while True:
+                scheduled = start + tick * interval
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.recording = scheduled >= measure_start
+                name = self.random.choices(names, weights)[0]
+                task = asyncio.create_task(self.fire(client, name, self.random.choice(self.students), scheduled))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                tick += 1
+            if pending:
+                await asyncio.gather(*pending)
+        return self.report()
+
+    def report(self):
+        endpoints = {}
+        for name, values in sorted(self.samples.items()):
+            values.sort()
+            entry = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "rps": len(values) / self.duration,
+            }
+            for pct in BENCH_PERCENTILES:
+                entry[f"p{pct}_ms"] = percentile(values, pct) * 1000
+            endpoints[name] = entry
+        all_values = sorted(v for values in self.samples.values() for v in values)
+        total = {
+            "requests": len(all_values),
+            "errors": sum(self.errors.values()),
+            "rps": len(all_values) / self.duration,
+        }
+        for pct in BENCH_PERCENTILES:
+            total[f"p{pct}_ms"] = percentile(all_values, pct) * 1000
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "config": {
+                "baseUrl": self.base_url,
+                "students": self.student_count,
+                "rate": self.rate,
+                "duration": self.duration,
+                "warmup": self.warmup,
+                "mix": dict(BENCH_MIX),
+            },
+            "endpoints": endpoints,
+            "total": total,
+        }
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result, baseline=None):
+    """Print per-endpoint throughput and latency, with deltas against a baseline run"""
+    print(f"\n📊 Benchmark Results ({result['commit'] or 'unknown commit'}):")
+    header = f"   {'endpoint':<12} {'req':>7} {'err':>5} {'rps':>8}" + "".join(f" {f'p{p} ms':>10}" for p in BENCH_PERCENTILES)
+    print(header)
+    rows = list(result["endpoints"].items()) + [("total", result["total"])]
+    for name, entry in rows:
+        line = f"   {name:<12} {entry['requests']:>7} {entry['errors']:>5} {entry['rps']:>8.1f}"
+        line += "".join(f" {entry[f'p{p}_ms']:>10.1f}" for p in BENCH_PERCENTILES)
+        print(line)
+        if baseline is None:
+            continue
+        base = baseline["total"] if name == "total" else baseline["endpoints"].get(name)
+        if not base:
+            continue
+        deltas = [f"{'rps':>8} {change(base['rps'], entry['rps'])}"]
+        deltas += [f"p{p} {change(base[f'p{p}_ms'], entry[f'p{p}_ms'])}" for p in BENCH_PERCENTILES]
+        print(f"   {'':<12} vs {baseline.get('commit') or 'baseline'}: " + ", ".join(d.strip() for d in deltas))
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+def wait_for_server(base_url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/talismans", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready in time")
+
+def spawn_server(port, workers):
+    """Start `uvicorn server:app` from backend/ with the current MONGO_URL/DB_NAME"""
+    command = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(command, cwd=Path(__file__).parent / "backend", env=os.environ.copy())
+
+def run_benchmark(args):
+    base_url = args.base_url
+    process = None
+    if args.spawn:
+        base_url = f"http://127.0.0.1:{args.port}/api"
+        print(f"🔧 Starting uvicorn on port {args.port} ({args.workers} worker(s))...")
+        process = spawn_server(args.port, args.workers)
+    try:
+        if process is not None:
+            wait_for_server(base_url, process)
+        benchmark = LoadBenchmark(base_url, args.students, args.rate, args.duration, args.warmup, args.seed)
+        result = asyncio.run(benchmark.drive())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+    return 0 if result["total"]["requests"] else 1
+
+def converge(check, timeout):
+    """Poll `check` until it returns True; returns seconds taken or None on timeout"""
+    started = time.time()
+    while time.time() - started < timeout:
+        if check():
+            return time.time() - started
+        time.sleep(0.05)
+    return None
+
+def run_invalidation_check(base_url, attempts, timeout):
+    """Change state through one worker and check every worker sees it.
+
+    Each request opens a fresh connection so uvicorn workers share the load.
+    Against a single-node replica set (`mongod --replSet rs0` + `rs.initiate()`)
+    this exercises change streams. Against a standalone mongod it exercises the
+    capped `invalidations` fallback.
+    """
+    def fresh_get(path, token):
+        return requests.get(f"{base_url}{path}", headers={"Authorization": f"Bearer {token}"}, timeout=10)
+
+    def all_workers(predicate):
+        return all(predicate() for _ in range(attempts))
+
+    suffix = datetime.now().strftime('%H%M%S%f')
+    response = requests.post(f"{base_url}/auth/register", json={
+        "username": f"invalidation_{suffix}", "email": f"invalidation_{suffix}@example.com", "password": "Test123!"
+    }, timeout=10)
+    response.raise_for_status()
+    token = response.json()["token"]
+    username = response.json()["user"]["username"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Warm every worker's user cache and leaderboard with the zero-XP state
+    all_workers(lambda: fresh_get("/user/profile", token).status_code == 200)
+    spell = requests.post(f"{base_url}/spells", json={
+        "title": "Invalidation check", "description": "", "repeatType": "DAILY", "xpReward": 25
+    }, headers=headers, timeout=10).json()
+    requests.post(f"{base_url}/spells/{spell['id']}/complete", headers=headers, timeout=10).raise_for_status()
+
+    results = []
+    lag = converge(lambda: all_workers(lambda: fresh_get("/user/profile", token).json().get("xp") == 25), timeout)
+    results.append(("profile XP after completion", lag))
+    lag = converge(lambda: all_workers(lambda: any(
+        entry["username"] == username and entry["xp"] == 25
+        for entry in fresh_get("/leaderboard?limit=100", token).json()
+    )), timeout)
+    results.append(("leaderboard XP after completion", lag))
+
+    requests.post(f"{base_url}/auth/logout", headers=headers, timeout=10).raise_for_status()
+    lag = converge(lambda: all_workers(lambda: fresh_get("/user/profile", token).status_code == 401), timeout)
+    results.append(("token rejected after logout", lag))
+
+    print("\n🔁 Cross-worker cache invalidation")
+    for name, lag in results:
+        if lag is None:
+            print(f"❌ {name} - not visible on all workers within {timeout:.1f}s")
+        else:
+            print(f"✅ {name} - consistent after {lag * 1000:.0f} ms")
+    return 0 if all(lag is not None for _, lag in results) else 1
+
+def run_invalidation(args):
+    base_url = args.base_url
+    process = None
+    if args.spawn:
+        base_url = f"http://127.0.0.1:{args.port}/api"
+        workers = max(args.workers, 2)
+        print(f"🔧 Starting uvicorn on port {args.port} ({workers} workers)...")
+        process = spawn_server(args.port, workers)
+    try:
+        if process is not None:
+            wait_for_server(base_url, process)
+        return run_invalidation_check(base_url, args.attempts, args.timeout)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Academic Wizard API tests and load benchmark")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="API root, e.g. http://localhost:8001/api")
+    parser.add_argument("--bench", action="store_true", help="Run the concurrent load benchmark instead of the functional tests")
+    parser.add_argument("--invalidation", action="store_true", help="Check that cache updates reach every uvicorn worker")
+    parser.add_argument("--attempts", type=int, default=20, help="Requests per consistency probe in --invalidation")
+    parser.add_argument("--timeout", type=float, default=5, help="Seconds to wait for all workers to agree in --invalidation")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn server:app (needs MONGO_URL/DB_NAME of a local mongod)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when --spawn is used")
+    parser.add_argument("--students", type=int, default=50, help="Number of virtual students")
+    parser.add_argument("--rate", type=float, default=100, help="Target requests per second across all students")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before measuring")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the request mix")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to diff against")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.bench:
+        return run_benchmark(args)
+    if args.invalidation:
+        return run_invalidation(args)
+
+    tester = AcademicWizardAPITester(args.base_url)
     
     try:
         tester.run_all_tests()
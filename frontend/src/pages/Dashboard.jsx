@@ -25,15 +25,26 @@ const Dashboard = () => {
 
   const loadData = async () => {
     try {
-      const [spellsRes, statsRes, leaderboardRes] = await Promise.all([
-        axios.get(`${API_URL}/spells`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/user/stats`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/leaderboard?limit=5`, { headers: { Authorization: `Bearer ${token}` } })
-      ]);
+      const headers = { Authorization: `Bearer ${token}` };
+      const response = await axios.get(`${API_URL}/dashboard?sections=spells,stats,leaderboard&leaderboardLimit=5`, {
+        headers
+      });
       
-      setSpells(spellsRes.data);
-      setStats(statsRes.data);
-      setLeaderboard(leaderboardRes.data);
+      // Büyü özetleri sınırı aşarsa kalan sayfalar X-Next-Cursor ile alınır
+      let allSpells = response.data.spells;
+      let cursor = response.headers['x-next-cursor'];
+      while (cursor) {
+        const page = await axios.get(`${API_URL}/spells`, {
+          headers,
+          params: { fields: 'summary', after: cursor, limit: 500 }
+        });
+        allSpells = allSpells.concat(page.data);
+        cursor = page.headers['x-next-cursor'];
+      }
+      
+      setSpells(allSpells);
+      setStats(response.data.stats);
+      setLeaderboard(response.data.leaderboard);
     } catch (error) {
       console.error('Veri yüklenemedi:', error);
       toast.error('Veri yüklenirken bir hata oluştu');
@@ -70,8 +81,7 @@ const Dashboard = () => {
   };
 
   const getTodayActiveSpells = () => {
-    const today = new Date().toISOString().split('T')[0];
-    return spells.filter(spell => !spell.completedDates.includes(today));
+    return spells.filter(spell => !spell.completedToday);
   };
 
   const xpForCurrentLevel = (user?.level - 1) * 100;
@@ -32,10 +32,18 @@ const Spells = () => {
 
   const loadSpells = async () => {
     try {
-      const response = await axios.get(`${API_URL}/spells`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setSpells(response.data);
+      // Liste sınırı aşınca sunucu X-Next-Cursor döner; kalan sayfalar keyset ile alınır
+      const headers = { Authorization: `Bearer ${token}` };
+      let response = await axios.get(`${API_URL}/spells`, { headers });
+      let allSpells = response.data;
+      while (response.headers['x-next-cursor']) {
+        response = await axios.get(`${API_URL}/spells`, {
+          headers,
+          params: { after: response.headers['x-next-cursor'], limit: 500 }
+        });
+        allSpells = allSpells.concat(response.data);
+      }
+      setSpells(allSpells);
     } catch (error) {
       console.error('Büyüler yüklenemedi:', error);
       toast.error('Büyüler yüklenirken bir hata oluştu');
@@ -189,7 +197,7 @@ const Spells = () => {
                   <span className="text-sm text-cyan-400 font-bold">+{spell.xpReward} XP</span>
                 </div>
                 <div className="text-xs text-slate-500 font-manrope mb-4">
-                  Tamamlanma: {spell.completedDates.length} kez
+                  Tamamlanma: {spell.completionCount} kez
                 </div>
                 <Button
                   variant="destructive"
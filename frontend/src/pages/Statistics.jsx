@@ -11,10 +11,10 @@ import { toast } from 'sonner';
 const API_URL = process.env.REACT_APP_BACKEND_URL + '/api';
 
 const Statistics = () => {
-  const { token, user } = useAuth();
+  const { token } = useAuth();
   const navigate = useNavigate();
   const [stats, setStats] = useState(null);
-  const [spells, setSpells] = useState([]);
+  const [statistics, setStatistics] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -23,13 +23,12 @@ const Statistics = () => {
 
   const loadStats = async () => {
     try {
-      const [statsRes, spellsRes] = await Promise.all([
-        axios.get(`${API_URL}/user/stats`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/spells`, { headers: { Authorization: `Bearer ${token}` } })
-      ]);
+      const response = await axios.get(`${API_URL}/dashboard?sections=stats,statistics`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
       
-      setStats(statsRes.data);
-      setSpells(spellsRes.data);
+      setStats(response.data.stats);
+      setStatistics(response.data.statistics);
     } catch (error) {
       console.error('İstatistikler yüklenemedi:', error);
       toast.error('İstatistikler yüklenirken bir hata oluştu');
@@ -38,26 +37,22 @@ const Statistics = () => {
     }
   };
 
+  const spells = statistics?.spells || [];
+
   const getSpellTypeData = () => {
-    const daily = spells.filter(s => s.repeatType === 'DAILY').length;
-    const weekly = spells.filter(s => s.repeatType === 'WEEKLY').length;
-    
+    // Son 30 gündeki tamamlanmaların tip dağılımı (sunucuda hesaplanır)
     return [
-      { name: 'Günlük', value: daily },
-      { name: 'Haftalık', value: weekly }
+      { name: 'Günlük', value: statistics?.repeatTypes?.DAILY || 0 },
+      { name: 'Haftalık', value: statistics?.repeatTypes?.WEEKLY || 0 }
     ];
   };
 
   const getXPData = () => {
-    // Simulated XP progression data
-    const levels = [];
-    for (let i = 1; i <= user?.level; i++) {
-      levels.push({
-        level: `Lv ${i}`,
-        xp: i * 100
-      });
-    }
-    return levels;
+    // Son 30 günün günlük XP'si
+    return (statistics?.periods || []).map(period => ({
+      day: period.period.slice(5),
+      xp: period.xp
+    }));
   };
 
   if (loading) {
@@ -152,7 +147,7 @@ const Statistics = () => {
               <ResponsiveContainer width="100%" height={300}>
                 <LineChart data={getXPData()}>
                   <CartesianGrid strokeDasharray="3 3" stroke="#334155" />
-                  <XAxis dataKey="level" stroke="#94a3b8" />
+                  <XAxis dataKey="day" stroke="#94a3b8" />
                   <YAxis stroke="#94a3b8" />
                   <Tooltip
                     contentStyle={{
@@ -200,17 +195,19 @@ const Statistics = () => {
             <div className="space-y-3">
               {spells.map((spell) => (
                 <div
-                  key={spell.id}
+                  key={spell.spellId}
                   className="flex items-center justify-between p-4 bg-slate-900/30 rounded-lg border border-slate-800"
-                  data-testid={`spell-history-${spell.id}`}
+                  data-testid={`spell-history-${spell.spellId}`}
                 >
                   <div>
                     <p className="font-semibold text-slate-100 font-cinzel">{spell.title}</p>
-                    <p className="text-sm text-slate-400 font-manrope">{spell.description}</p>
+                    <p className="text-sm text-slate-400 font-manrope">
+                      {spell.repeatType === 'DAILY' ? 'Günlük' : 'Haftalık'} · %{Math.round(spell.rate * 100)} tamamlanma
+                    </p>
                   </div>
                   <div className="text-right">
-                    <p className="text-lg font-bold text-violet-400">{spell.completedDates.length}</p>
-                    <p className="text-xs text-slate-500 font-manrope">Tamamlama</p>
+                    <p className="text-lg font-bold text-violet-400">{spell.completions}</p>
+                    <p className="text-xs text-slate-500 font-manrope">Son 30 gün</p>
                   </div>
                 </div>
               ))}
@@ -23,13 +23,16 @@ const Talismans = () => {
 
   const loadTalismans = async () => {
     try {
-      const [allRes, userRes] = await Promise.all([
-        axios.get(`${API_URL}/talismans`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/user/talismans`, { headers: { Authorization: `Bearer ${token}` } })
+      // Katalog kendi ETag'li endpoint'inden (tarayıcı önbelleği, 304); sadece kullanıcıya ait kısım aggregate'ten
+      const [allRes, dashboardRes] = await Promise.all([
+        axios.get(`${API_URL}/talismans`),
+        axios.get(`${API_URL}/dashboard?sections=userTalismans`, {
+          headers: { Authorization: `Bearer ${token}` }
+        })
       ]);
       
       setAllTalismans(allRes.data);
-      setUserTalismans(userRes.data);
+      setUserTalismans(dashboardRes.data.userTalismans);
     } catch (error) {
       console.error('Tılsımlar yüklenemedi:', error);
       toast.error('Tılsımlar yüklenirken bir hata oluştu');
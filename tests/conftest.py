@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# server.py modül yüklenirken bu değişkenleri okur; istemci bağlantıyı ilk sorguda açar
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "academic_wizard_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
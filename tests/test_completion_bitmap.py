@@ -0,0 +1,159 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+from bson.int64 import Int64
+
+from server import (
+    COMPLETION_EPOCH, CompletionBitmap, TalismanCondition, TalismanRuleEngine, TALISMAN_RULES, completion_slot,
+    count_completions, expand_completions, spell_response, spell_view, talisman_catalog, talisman_unlock_operations,
+)
+
+def day(offset: int) -> date:
+    return COMPLETION_EPOCH + timedelta(days=offset)
+
+# Kelime sınırlarının iki yanı, 63. bit (işaretli Int64'te negatif) ve uzak bir kelime
+BOUNDARY_DAYS = [day(offset) for offset in (0, 1, 62, 63, 64, 65, 127, 128, 191, 1000)]
+
+def test_completion_slot_splits_days_into_64_bit_words():
+    assert completion_slot(day(0)) == ("0", 0)
+    assert completion_slot(day(63)) == ("0", 63)
+    assert completion_slot(day(64)) == ("1", 0)
+    with pytest.raises(ValueError):
+        completion_slot(COMPLETION_EPOCH - timedelta(days=1))
+
+def test_bson_round_trip_keeps_bit_63():
+    bitmap = CompletionBitmap.from_days(BOUNDARY_DAYS)
+    
+    stored = bitmap.to_bson()
+    restored = CompletionBitmap.from_doc({"completionBits": stored})
+    
+    assert all(isinstance(word, Int64) for word in stored.values())
+    assert stored["0"] < 0  # 63. bit işaret biti olarak saklanır
+    assert restored.words == bitmap.words
+    assert list(restored.days()) == sorted(BOUNDARY_DAYS)
+    assert len(restored) == len(BOUNDARY_DAYS)
+
+def test_full_word_round_trip():
+    bitmap = CompletionBitmap.from_days(day(offset) for offset in range(64))
+    
+    restored = CompletionBitmap.from_doc({"completionBits": bitmap.to_bson()})
+    
+    assert bitmap.to_bson()["0"] == Int64(-1)
+    assert len(restored) == 64
+    assert day(63) in restored and day(64) not in restored
+
+def test_from_doc_merges_legacy_completed_dates():
+    doc = {
+        "completionBits": CompletionBitmap.from_days([day(10)]).to_bson(),
+        "completedDates": [day(10).isoformat(), day(70).isoformat()],
+    }
+    
+    bitmap = CompletionBitmap.from_doc(doc)
+    
+    assert bitmap.iso_dates() == [day(10).isoformat(), day(70).isoformat()]
+    assert expand_completions(dict(doc))["completedDates"] == bitmap.iso_dates()
+
+def test_default_list_counts_completions_without_expanding_dates():
+    doc = {
+        "id": "s1",
+        "completionBits": CompletionBitmap.from_days(BOUNDARY_DAYS).to_bson(),
+        "completedDates": [day(2000).isoformat()],
+    }
+    
+    rendered = spell_response(dict(doc))
+    
+    assert rendered["completionCount"] == len(BOUNDARY_DAYS) + 1
+    assert "completedDates" not in rendered and "completionBits" not in rendered
+    assert count_completions({"id": "s2"})["completionCount"] == 0
+
+def test_requested_fields_expand_dates_only_when_asked():
+    doc = {"id": "s1", "createdAt": None, "completionBits": CompletionBitmap.from_days([day(3), day(70)]).to_bson()}
+    
+    counted = spell_view("completionCount")
+    expanded = spell_view("completedDates,completionCount")
+    
+    assert "completionCount" not in counted.projection and counted.projection["completionBits"] == 1
+    assert counted.render(dict(doc)) == {"id": "s1", "createdAt": None, "completionCount": 2}
+    assert expanded.render(dict(doc))["completedDates"] == [day(3).isoformat(), day(70).isoformat()]
+
+def test_contains_before_epoch_is_false():
+    assert COMPLETION_EPOCH - timedelta(days=1) not in CompletionBitmap.from_days([COMPLETION_EPOCH])
+
+@pytest.mark.parametrize("start, end", [
+    (0, 0), (0, 63), (63, 64), (60, 70), (64, 127), (62, 129), (5, 1000), (128, 191), (200, 100),
+])
+def test_count_range_matches_set_count(start, end):
+    days = set(BOUNDARY_DAYS)
+    bitmap = CompletionBitmap.from_days(days)
+    
+    expected = sum(1 for completed in days if day(start) <= completed <= day(end))
+    assert bitmap.count_range(day(start), day(end)) == expected
+
+def test_count_range_clamps_start_to_epoch():
+    bitmap = CompletionBitmap.from_days([day(0), day(1)])
+    
+    assert bitmap.count_range(COMPLETION_EPOCH - timedelta(days=30), day(0)) == 1
+
+def brute_force_streak(days, end: date) -> int:
+    streak = 0
+    while end in days:
+        streak += 1
+        end -= timedelta(days=1)
+    return streak
+
+def test_streak_ending_matches_brute_force_across_words():
+    rng = random.Random(7)
+    days = {day(offset) for offset in range(300) if rng.random() < 0.8}
+    days |= {day(offset) for offset in range(40, 140)}  # iki kelime sınırını aşan uzun seri
+    bitmap = CompletionBitmap.from_days(days)
+    
+    for offset in range(310):
+        assert bitmap.streak_ending(day(offset)) == brute_force_streak(days, day(offset)), offset
+
+def test_streak_ending_runs_back_to_epoch():
+    bitmap = CompletionBitmap.from_days(day(offset) for offset in range(130))
+    
+    assert bitmap.streak_ending(day(129)) == 130
+    assert bitmap.streak_ending(day(130)) == 0
+
+def test_rule_engine_returns_only_crossed_thresholds():
+    engine = TalismanRuleEngine(TALISMAN_RULES)
+    
+    met = engine.newly_met(
+        {"totalSpellsCompleted": 9, "level": 4, "currentStreak": 6},
+        {"totalSpellsCompleted": 50, "level": 5, "currentStreak": 6},
+    )
+    
+    assert set(met) == {TalismanCondition.SPELLS_10, TalismanCondition.SPELLS_50, TalismanCondition.LEVEL_5}
+
+def test_rule_engine_thresholds_are_inclusive_and_not_repeated():
+    engine = TalismanRuleEngine(TALISMAN_RULES)
+    
+    assert engine.newly_met({"totalSpellsCompleted": 0}, {"totalSpellsCompleted": 1}) == [TalismanCondition.FIRST_SPELL]
+    assert engine.newly_met({"totalSpellsCompleted": 1}, {"totalSpellsCompleted": 9}) == []
+    assert engine.newly_met({"currentStreak": 30}, {"currentStreak": 1}) == []
+
+def test_rule_engine_from_zero_returns_everything_met():
+    engine = TalismanRuleEngine(TALISMAN_RULES)
+    
+    met = engine.newly_met({}, {"totalSpellsCompleted": 100, "level": 10, "currentStreak": 7})
+    
+    assert set(met) == set(TalismanCondition) - {TalismanCondition.STREAK_30}
+
+def test_unlock_operations_only_insert_catalog_talismans_for_met_conditions():
+    talisman_catalog.set([
+        {"id": "t1", "name": "İlk", "description": "", "iconUrl": "", "condition": "FIRST_SPELL"},
+        {"id": "t2", "name": "Seri", "description": "", "iconUrl": "", "condition": "STREAK_7"},
+    ])
+    try:
+        operations = talisman_unlock_operations(
+            "u1", [TalismanCondition.FIRST_SPELL, TalismanCondition.LEVEL_5, TalismanCondition.STREAK_7]
+        )
+    finally:
+        talisman_catalog.set([])
+    
+    assert [op._filter for op in operations] == [
+        {"userId": "u1", "talismanId": "t1"}, {"userId": "u1", "talismanId": "t2"},
+    ]
+    assert all(set(op._doc) == {"$setOnInsert"} and op._upsert for op in operations)
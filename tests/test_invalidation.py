@@ -0,0 +1,144 @@
+"""InvalidationBus integration tests against a real mongod.
+
+Both modes need a server, so each test is skipped unless its URL is set:
+
+    TEST_MONGO_STANDALONE_URL=mongodb://localhost:27017      (capped-collection "poll" mode)
+    TEST_MONGO_REPLSET_URL=mongodb://localhost:27018/?replicaSet=rs0   (change streams)
+
+A single-node replica set is enough: `mongod --replSet rs0 --port 27018` followed by
+`mongosh --port 27018 --eval 'rs.initiate()'`. Every test uses a throwaway database.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import server
+
+STANDALONE_URL = os.environ.get("TEST_MONGO_STANDALONE_URL")
+REPLSET_URL = os.environ.get("TEST_MONGO_REPLSET_URL")
+
+class RecordingBus(server.InvalidationBus):
+    # Mesajları modül önbelleklerine uygulamak yerine kaydeder
+    def __init__(self, mode: str):
+        super().__init__(mode, 1024 * 1024, 0.05)
+        self.applied = []
+        self.resyncs = 0
+
+    async def apply(self, collection, key, doc):
+        self.applied.append((collection, key, doc))
+
+    async def resync(self):
+        self.resyncs += 1
+
+async def wait_for(predicate, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("beklenen geçersizleştirme gelmedi")
+        await asyncio.sleep(0.02)
+
+def run_against(url, monkeypatch, scenario):
+    async def main():
+        client = AsyncIOMotorClient(url, serverSelectionTimeoutMS=3000)
+        database = client[f"invalidation_test_{uuid.uuid4().hex[:8]}"]
+        monkeypatch.setattr(server, "client", client)
+        monkeypatch.setattr(server, "db", database)
+        try:
+            await scenario(database)
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+    asyncio.run(main())
+
+def message(origin, key, _id=None):
+    doc = {"origin": origin, "collection": "users", "key": key, "doc": None, "createdAt": datetime.now(timezone.utc)}
+    if _id is not None:
+        doc["_id"] = _id
+    return doc
+
+@pytest.mark.skipif(not STANDALONE_URL, reason="TEST_MONGO_STANDALONE_URL ayarlı değil")
+def test_poll_mode_delivers_other_workers_messages(monkeypatch):
+    async def scenario(database):
+        reader, writer = RecordingBus("poll"), RecordingBus("poll")
+        await reader.prepare()
+        await writer.prepare()
+        reader.start()
+        try:
+            await writer.publish("users", "u1", {"id": "u1"})
+            await reader.publish("users", "own", None)  # kendi mesajı uygulanmaz
+            await writer.publish("talismans", "*")
+            await wait_for(lambda: len(reader.applied) == 2)
+            assert reader.applied == [("users", "u1", {"id": "u1"}), ("talismans", "*", None)]
+        finally:
+            await reader.stop()
+    run_against(STANDALONE_URL, monkeypatch, scenario)
+
+@pytest.mark.skipif(not STANDALONE_URL, reason="TEST_MONGO_STANDALONE_URL ayarlı değil")
+def test_poll_mode_follows_insertion_order_not_object_id_order(monkeypatch):
+    async def scenario(database):
+        reader = RecordingBus("poll")
+        await reader.prepare()
+        reader.start()
+        try:
+            # Başka süreçten, okuyucunun geçtiği mesajdan daha küçük _id ile sonradan eklenen mesaj
+            await database.invalidations.insert_one(message("other", "newer-id"))
+            await wait_for(lambda: len(reader.applied) == 1)
+            older_id = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(minutes=5))
+            await database.invalidations.insert_one(message("other", "older-id", older_id))
+            await wait_for(lambda: len(reader.applied) == 2)
+            assert [key for _, key, _ in reader.applied] == ["newer-id", "older-id"]
+        finally:
+            await reader.stop()
+    run_against(STANDALONE_URL, monkeypatch, scenario)
+
+@pytest.mark.skipif(not STANDALONE_URL, reason="TEST_MONGO_STANDALONE_URL ayarlı değil")
+def test_poll_mode_resumes_after_last_seen_message_and_resyncs_when_it_is_gone(monkeypatch):
+    async def scenario(database):
+        reader = RecordingBus("poll")
+        await reader.prepare()
+        await database.invalidations.insert_one(message("other", "after-prepare"))
+        reader.start()
+        try:
+            await wait_for(lambda: len(reader.applied) == 1)
+            assert reader.resyncs == 0
+        finally:
+            await reader.stop()
+        
+        # Son görülen mesaj artık yok (capped koleksiyon taştı): önbellekler yeniden yüklenmeli
+        reader._last_id = ObjectId()
+        reader.start()
+        try:
+            await wait_for(lambda: reader.resyncs == 1)
+            await database.invalidations.insert_one(message("other", "after-resync"))
+            await wait_for(lambda: len(reader.applied) == 2)
+            assert reader.applied[-1][1] == "after-resync"
+        finally:
+            await reader.stop()
+    run_against(STANDALONE_URL, monkeypatch, scenario)
+
+@pytest.mark.skipif(not REPLSET_URL, reason="TEST_MONGO_REPLSET_URL ayarlı değil")
+def test_changestream_mode_applies_writes(monkeypatch):
+    async def scenario(database):
+        reader = RecordingBus("auto")
+        await reader.prepare()
+        assert reader.mode == "changestream"
+        reader.start()
+        try:
+            await database.users.insert_one({"id": "u1", "username": "a", "xp": 0, "password": "x"})
+            await database.users.update_one({"id": "u1"}, {"$set": {"xp": 25}})
+            await database.revoked_tokens.insert_one({"_id": "digest", "expiresAt": datetime.now(timezone.utc)})
+            await database.users.delete_one({"id": "u1"})
+            await wait_for(lambda: len(reader.applied) == 4)
+            (_, key1, doc1), (_, key2, doc2), revoked, deleted = reader.applied
+            assert (key1, doc1["xp"], key2, doc2["xp"]) == ("u1", 0, "u1", 25)
+            assert "password" not in doc1
+            assert revoked[:2] == ("revoked_tokens", "digest")
+            assert deleted == ("users", "*", None)
+        finally:
+            await reader.stop()
+    run_against(REPLSET_URL, monkeypatch, scenario)
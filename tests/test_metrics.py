@@ -0,0 +1,49 @@
+import threading
+from types import SimpleNamespace
+
+from server import Counter, MongoPoolMetrics
+
+ADDRESS = ("localhost", 27017)
+
+def event(**fields):
+    return SimpleNamespace(address=ADDRESS, **fields)
+
+def test_pool_gauges_balance_under_concurrent_checkouts():
+    metrics = MongoPoolMetrics()
+    metrics.pool_created(event(options={"maxPoolSize": 100}))
+    
+    def worker():
+        for _ in range(2000):
+            metrics.connection_check_out_started(event())
+            metrics.connection_checked_out(event())
+            metrics.connection_checked_in(event())
+    
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    snapshot = metrics.snapshot()
+    assert snapshot["checked_out"] == {"localhost:27017": 0}
+    assert snapshot["waiting"] == {"localhost:27017": 0}
+    assert snapshot["options"] == {"localhost:27017": {"maxPoolSize": 100}}
+
+def test_pool_closed_drops_address_and_failures_are_counted():
+    metrics = MongoPoolMetrics()
+    metrics.connection_created(event())
+    metrics.connection_check_out_started(event())
+    metrics.connection_check_out_failed(event(reason="timeout"))
+    
+    metrics.pool_closed(event())
+    
+    snapshot = metrics.snapshot()
+    assert snapshot["open"] == {} and snapshot["waiting"] == {}
+    assert metrics.checkout_failures.snapshot() == {("localhost:27017", "timeout"): 1}
+
+def test_counter_renders_prometheus_text():
+    counter = Counter("demo_total", "Demo", ("route",))
+    counter.inc(("/a",))
+    counter.inc(("/a",), 2)
+    
+    assert list(counter.render()) == ["# HELP demo_total Demo", "# TYPE demo_total counter", 'demo_total{route="/a"} 3']
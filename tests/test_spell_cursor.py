@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from server import spell_after_filter, spell_cursor
+
+def test_date_cursor_resumes_after_created_at_then_id():
+    created_at = datetime(2026, 10, 1, 12, 30, tzinfo=timezone.utc)
+    
+    query = spell_after_filter(spell_cursor({"id": "b", "createdAt": created_at}))
+    
+    assert query == {"$or": [
+        {"createdAt": {"$gt": created_at}},
+        {"createdAt": created_at, "id": {"$gt": "b"}},
+    ]}
+
+def test_string_cursor_also_matches_every_migrated_date():
+    # migrate-dates öncesi metin createdAt; BSON sırasında tüm tarihler metinlerden sonra gelir
+    query = spell_after_filter(spell_cursor({"id": "a", "createdAt": "2026-10-01T12:30:00"}))
+    
+    assert query["$or"] == [
+        {"createdAt": {"$gt": "2026-10-01T12:30:00"}},
+        {"createdAt": "2026-10-01T12:30:00", "id": {"$gt": "a"}},
+        {"createdAt": {"$type": "date"}},
+    ]
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "WyJ4IiwxLCJhIl0", "c3BlbGwtaWQ"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        spell_after_filter(cursor)
+    
+    assert error.value.status_code == 400
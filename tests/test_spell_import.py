@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timezone
+
+from server import csv_stream, import_rows
+
+class FakeRequest:
+    # import_rows sadece request.stream() kullanır
+    def __init__(self, body: bytes, chunk_size: int = 7):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        for offset in range(0, len(self.body), self.chunk_size):
+            yield self.body[offset:offset + self.chunk_size]
+
+async def iterate(items):
+    for item in items:
+        yield item
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+def import_csv(body: bytes):
+    return asyncio.run(collect(import_rows(FakeRequest(body), is_csv=True)))
+
+def test_csv_export_round_trips_multiline_description():
+    spell = {
+        "id": "s1", "title": "Okuma", "description": "line1\nline2\n\n\"alıntı\", son",
+        "repeatType": "DAILY", "xpReward": 15, "completedDates": ["2026-10-01"],
+        "createdAt": datetime(2026, 10, 1, tzinfo=timezone.utc),
+    }
+    exported = "".join(asyncio.run(collect(csv_stream(iterate([dict(spell)]), lambda doc: doc))))
+    
+    rows = import_csv(exported.encode("utf-8"))
+    
+    assert len(rows) == 1
+    line, row = rows[0]
+    assert line == 2
+    assert row["description"] == spell["description"]
+    assert row["title"] == "Okuma"
+    assert row["xpReward"] == "15"
+
+def test_csv_rows_after_multiline_field_keep_their_line_numbers():
+    body = 'title,description\r\nA,"x\r\ny"\r\n\r\nB,z\r\n'.encode("utf-8")
+    
+    rows = import_csv(body)
+    
+    assert rows == [(2, {"title": "A", "description": "x\ny"}), (5, {"title": "B", "description": "z"})]
+
+def test_csv_unterminated_quote_is_reported():
+    rows = import_csv(b'title,description\nA,"never closed\nB,z\n')
+    
+    assert rows == [(2, "Kapanmamış tırnak")]
@@ -0,0 +1,26 @@
+from datetime import date, datetime, timezone
+
+from server import StatisticsGranularity, summarize_statistics
+
+def spell(spell_id, created_at):
+    return {"id": spell_id, "title": spell_id, "repeatType": "DAILY", "createdAt": created_at}
+
+def test_string_and_bson_created_at_give_the_same_rates():
+    # migrate-dates öncesi metin tarihli büyü, BSON date'li eşiyle aynı beklentiyi almalı
+    rollups = [{"day": "2026-10-05", "completions": 2, "xp": 20, "bySpell": {"old": 1, "new": 1}}]
+    spells = [
+        spell("old", "2026-10-04T08:30:00+00:00"),
+        spell("new", datetime(2026, 10, 4, 8, 30, tzinfo=timezone.utc)),
+    ]
+    
+    result = summarize_statistics(rollups, spells, date(2026, 10, 1), date(2026, 10, 10), StatisticsGranularity.DAY)
+    
+    rates = {rate.spellId: (rate.completions, rate.expected) for rate in result.spells}
+    assert rates == {"old": (1, 7), "new": (1, 7)}
+
+def test_unreadable_string_created_at_counts_from_range_start():
+    result = summarize_statistics(
+        [], [spell("broken", "not-a-date")], date(2026, 10, 1), date(2026, 10, 10), StatisticsGranularity.DAY
+    )
+    
+    assert result.spells[0].expected == 10
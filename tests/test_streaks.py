@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from server import streak_arrays, streak_corrections
+
+TODAY = 1000
+
+def python_streaks(completions, user_count, today):
+    # Referans: her kullanıcının tekil günlerini sıralayıp ardışık run'ları sayar
+    current, maximum, last = [0] * user_count, [0] * user_count, [-1] * user_count
+    for user in range(user_count):
+        days = sorted({day for owner, day in completions if owner == user})
+        run = 0
+        for index, day in enumerate(days):
+            run = run + 1 if index and day == days[index - 1] + 1 else 1
+            maximum[user] = max(maximum[user], run)
+        if days:
+            last[user] = days[-1]
+            current[user] = run if days[-1] >= today - 1 else 0
+    return current, maximum, last
+
+FIXTURES = {
+    "empty": ([], 1),
+    "empty-many-users": ([], 3),
+    "single-today": ([(0, TODAY)], 1),
+    "yesterday-run": ([(0, TODAY - 3), (0, TODAY - 2), (0, TODAY - 1)], 1),
+    "broken-run": ([(0, TODAY - 10), (0, TODAY - 9), (0, TODAY - 8), (0, TODAY - 1), (0, TODAY)], 1),
+    "stale": ([(0, TODAY - 5), (0, TODAY - 4)], 1),
+    "duplicates": ([(0, TODAY), (0, TODAY), (0, TODAY - 1), (0, TODAY - 1)], 1),
+    "mixed-users": (
+        [(0, TODAY), (2, 5), (2, 6), (2, 7), (2, 9), (0, TODAY - 1), (3, TODAY - 1)], 4
+    ),
+    "unsorted": ([(1, TODAY), (0, 64), (1, TODAY - 1), (0, 63), (0, 65)], 2),
+}
+
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_streak_arrays_matches_python(name):
+    completions, user_count = FIXTURES[name]
+    users = np.array([user for user, _ in completions], dtype=np.int32)
+    days = np.array([day for _, day in completions], dtype=np.int32)
+    
+    current, maximum, last = streak_arrays(users, days, user_count, TODAY)
+    
+    expected = python_streaks(completions, user_count, TODAY)
+    assert (current.tolist(), maximum.tolist(), last.tolist()) == expected
+
+def test_streak_arrays_empty_keeps_zero_streaks():
+    current, maximum, last = streak_arrays(
+        np.array([], dtype=np.int32), np.array([], dtype=np.int32), 2, TODAY
+    )
+    
+    assert current.tolist() == [0, 0]
+    assert maximum.tolist() == [0, 0]
+    assert last.tolist() == [-1, -1]
+
+def computed(**overrides):
+    values = {"currentStreak": 3, "maxStreak": 5, "totalSpellsCompleted": 20, "lastCompletionDate": "2026-10-16"}
+    values.update(overrides)
+    return values
+
+def test_corrections_fix_streak_drift():
+    current = {"currentStreak": 1, "maxStreak": 5, "totalSpellsCompleted": 20, "lastCompletionDate": "2026-10-16"}
+    
+    assert streak_corrections(current, computed()) == {"currentStreak": 3}
+
+def test_corrections_never_lower_cumulative_counters():
+    # Silinmiş büyülerin tamamlanmaları bitmap'lerde yok: toplamlar ve XP düşürülmez
+    current = {"currentStreak": 3, "maxStreak": 9, "totalSpellsCompleted": 40, "xp": 500, "level": 6,
+               "lastCompletionDate": "2026-10-16"}
+    
+    assert streak_corrections(current, computed(xp=200)) == {}
+    assert streak_corrections(current, computed(xp=650)) == {"xp": 650, "level": 7}
+
+def test_corrections_keep_streak_when_last_completion_is_not_in_bitmaps():
+    current = {"currentStreak": 4, "maxStreak": 5, "totalSpellsCompleted": 20, "lastCompletionDate": "2026-10-17"}
+    
+    assert streak_corrections(current, computed()) == {}
+    assert streak_corrections(current, computed(lastCompletionDate=None, currentStreak=0)) == {}
+
+def test_corrections_fill_missing_fields():
+    assert streak_corrections({}, computed()) == computed()